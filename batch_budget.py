@@ -0,0 +1,107 @@
+# batch_budget.py
+
+import os
+import json
+import threading
+
+
+# 메모리 부족(OOM) 예외인지 확인하는 함수 (CUDA OOM, CPU 할당 실패, MemoryError)
+def is_out_of_memory(error):
+    if isinstance(error, MemoryError):
+        return True
+    try:
+        import torch
+        if isinstance(error, torch.cuda.OutOfMemoryError):
+            return True
+    except (ImportError, AttributeError):
+        pass
+    message = str(error).lower()
+    return isinstance(error, RuntimeError) and ("out of memory" in message or "can't allocate memory" in message)
+
+
+class BatchBudget:
+    """
+    (모델, device, 디코딩 정책)별로 OOM 없이 처리할 수 있는 배치당 최대 토큰 수(패딩 포함)를 학습해 JSON에 저장
+    OOM이 나면 실패한 배치 크기의 backoff배로 줄이고, 예산에 가까운 배치가 grow_after번 연속 성공하면 grow배로 늘림
+    공유 GPU/CPU처럼 남은 메모리가 작업마다 달라지는 환경에서 다음 실행이 마지막으로 안전했던 값부터 시작하도록 함
+    예산, 가장 큰 성공 배치(largest_success), OOM 횟수는 파일에 저장하고, 연속 성공 횟수는 프로세스 안에서만 셈
+    """
+
+    def __init__(self, path, min_tokens=256, max_tokens=65536, backoff=0.5, grow=1.1, grow_after=20):
+        self.path = path
+        self.min_tokens = min_tokens
+        self.max_tokens = max_tokens
+        self.backoff = backoff
+        self.grow = grow
+        self.grow_after = grow_after
+        self._entries = {}
+        self._streaks = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                print(f"배치 예산 파일을 읽지 못해 새로 시작합니다: {path}")
+
+    @staticmethod
+    def make_key(model_name, device, policy_name):
+        return f"{model_name}|{device}|{policy_name}"
+
+    def get(self, key, default):
+        """학습된 배치당 최대 토큰 수 (처음 보는 키는 default에서 시작)"""
+        with self._lock:
+            return self._entry(key, default)["max_batch_tokens"]
+
+    def record_success(self, key, tokens):
+        with self._lock:
+            entry = self._entry(key, tokens)
+            if tokens > entry["largest_success"]:
+                entry["largest_success"] = tokens
+                self._save()
+            # 예산보다 훨씬 작은 배치의 성공은 예산을 늘릴 근거가 되지 못함
+            if tokens < entry["max_batch_tokens"] * 0.8:
+                return
+            streak = self._streaks.get(key, 0) + 1
+            if streak < self.grow_after or entry["max_batch_tokens"] >= self.max_tokens:
+                self._streaks[key] = streak
+                return
+            self._streaks[key] = 0
+            entry["max_batch_tokens"] = min(self.max_tokens, int(entry["max_batch_tokens"] * self.grow))
+            self._save()
+
+    def record_oom(self, key, tokens):
+        """OOM이 난 배치 토큰 수를 기록하고 줄어든 예산 반환"""
+        with self._lock:
+            entry = self._entry(key, tokens)
+            entry["oom_count"] += 1
+            self._streaks[key] = 0
+            # 예산을 줄이기 전에 만들어진 (예산보다 큰) 배치의 OOM은 예산을 줄이지 않음
+            # 이전에 성공한 크기라도 지금 남은 메모리가 줄었을 수 있으므로 largest_success 아래로도 줄임
+            new_budget = entry["max_batch_tokens"]
+            if tokens <= entry["max_batch_tokens"]:
+                new_budget = max(self.min_tokens, int(tokens * self.backoff))
+            if new_budget < entry["max_batch_tokens"]:
+                print(f"메모리 부족: 배치 예산 {entry['max_batch_tokens']} → {new_budget} 토큰 ({key})")
+                entry["max_batch_tokens"] = new_budget
+            self._save()
+            return entry["max_batch_tokens"]
+
+    def _entry(self, key, default):
+        if key not in self._entries:
+            self._entries[key] = {"max_batch_tokens": default, "largest_success": 0, "oom_count": 0}
+        return self._entries[key]
+
+    def _save(self):
+        path_dir = os.path.dirname(self.path)
+        if path_dir:
+            os.makedirs(path_dir, exist_ok=True)
+        # 중간에 죽어도 파일이 깨지지 않도록 임시 파일에 쓰고 교체
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def stats(self):
+        with self._lock:
+            return json.loads(json.dumps(self._entries))
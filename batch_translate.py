@@ -0,0 +1,281 @@
+# batch_translate.py
+# PDF 디렉토리(또는 목록 파일)를 OCR → 번역 → PDF 변환까지 한 번에 처리하는 명령행 배치 도구
+# - OCR은 모델을 미리 올린 상주 OCR 작업 프로세스 풀(ocr_worker), PDF 렌더링은 프로세스 풀에서 병렬로 실행
+# - 번역은 메인 프로세스의 모델 하나(또는 --server-url의 번역 서버)로 순서대로 처리
+# - 이미 만들어진 결과(markdown/output.md, *_translated.html, *_translated.pdf)는 건너뜀
+# - 마지막에 단계별 처리량(문서/시간) 요약 출력
+#
+# 사용 예:
+#   python batch_translate.py papers/ --output-dir outputs --ocr-workers 2 --pdf-workers 4
+#   python batch_translate.py --manifest papers.txt --server-url http://127.0.0.1:8765 --summary summary.json
+
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from ocr_worker import OCRWorkerPool
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STAGES = ("ocr", "translate", "pdf")
+
+
+# 처리할 PDF 목록 수집 함수 (디렉토리는 하위 폴더까지, 목록 파일은 한 줄에 경로 하나)
+def collect_pdfs(input_dir=None, manifest=None):
+    pdfs = []
+    if input_dir:
+        pdfs.extend(sorted(glob.glob(os.path.join(input_dir, "**", "*.pdf"), recursive=True)))
+    if manifest:
+        manifest_dir = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    pdfs.append(line if os.path.isabs(line) else os.path.join(manifest_dir, line))
+    return list(dict.fromkeys(os.path.abspath(p) for p in pdfs))
+
+
+# 문서별 출력 경로 (재실행 시 같은 경로를 써야 완료된 단계를 건너뛸 수 있으므로 시각을 붙이지 않음)
+def get_document_paths(pdf_path, output_dir):
+    name = os.path.splitext(os.path.basename(pdf_path))[0]
+    doc_dir = os.path.join(output_dir, name)
+    return {
+        "name": name,
+        "doc_dir": doc_dir,
+        "image_dir": os.path.join(doc_dir, "images"),
+        "md_dir": os.path.join(doc_dir, "markdown"),
+        "md_path": os.path.join(doc_dir, "markdown", "output.md"),
+        "html_path": os.path.join(doc_dir, f"{name}_translated.html"),
+        "pdf_path": os.path.join(doc_dir, f"{name}_translated.pdf"),
+    }
+
+
+# OCR 작업 함수 (프로세스 풀에서 실행, 반환: 걸린 초)
+def run_ocr(pdf_path, paths, shard_workers=1):
+    from ocr_pdf import ocr_pdf
+
+    start = time.perf_counter()
+    with open(pdf_path, "rb") as f:
+        pdf_bytes = f.read()
+    tmp_name = "output.md.tmp"
+    ocr_pdf(pdf_bytes, os.path.basename(pdf_path), paths["image_dir"], paths["md_dir"], md_filename=tmp_name, num_workers=shard_workers)
+    # 마크다운이 끝까지 저장된 뒤에만 완료로 보이도록 이름 변경
+    os.replace(os.path.join(paths["md_dir"], tmp_name), paths["md_path"])
+    return time.perf_counter() - start
+
+
+# PDF 변환 작업 함수 (프로세스 풀에서 실행, 반환: 걸린 초)
+def run_pdf(paths):
+    from transform_html import convert_html_to_pdf_with_math_images
+
+    start = time.perf_counter()
+    with open(paths["html_path"], "r", encoding="utf-8") as f:
+        html_content = f.read()
+    tmp_path = paths["pdf_path"] + ".tmp"
+    # 이미지 경로는 마크다운 파일 기준 상대 경로
+    convert_html_to_pdf_with_math_images(html_content, tmp_path, base_dir=paths["md_dir"])
+    os.replace(tmp_path, paths["pdf_path"])
+    return time.perf_counter() - start
+
+
+class BatchStats:
+    """단계별 처리/건너뜀/실패 문서 수와 처리 시간 집계"""
+
+    def __init__(self):
+        self.stages = {stage: {"done": 0, "skipped": 0, "failed": 0, "seconds": 0.0} for stage in STAGES}
+        self.failures = []
+        self._start = time.perf_counter()
+
+    def done(self, stage, seconds):
+        self.stages[stage]["done"] += 1
+        self.stages[stage]["seconds"] += seconds
+
+    def skipped(self, stage):
+        self.stages[stage]["skipped"] += 1
+
+    def failed(self, stage, name, error):
+        self.stages[stage]["failed"] += 1
+        self.failures.append({"stage": stage, "document": name, "error": error})
+        print(f"[{stage}] 실패: {name}: {error}")
+
+    def summary(self, documents, workers, final_output="pdf_path"):
+        wall_seconds = time.perf_counter() - self._start
+        completed = sum(1 for d in documents if os.path.exists(d[final_output]))
+        stages = {}
+        for stage, s in self.stages.items():
+            stages[stage] = {
+                **s,
+                "workers": workers[stage],
+                # 작업자 하나가 쉬지 않고 처리할 때의 문서/시간
+                "docs_per_hour_per_worker": s["done"] / s["seconds"] * 3600 if s["seconds"] else None,
+                "docs_per_hour": s["done"] / s["seconds"] * 3600 * workers[stage] if s["seconds"] else None,
+            }
+        return {
+            "documents": len(documents),
+            "completed": completed,
+            "wall_seconds": wall_seconds,
+            "docs_per_hour": completed / wall_seconds * 3600 if wall_seconds else 0.0,
+            "stages": stages,
+            "failures": self.failures,
+        }
+
+
+def print_summary(summary):
+    print(f"\n문서 {summary['documents']}개 중 {summary['completed']}개 완료, "
+          f"{summary['wall_seconds']:.0f}s, 전체 {summary['docs_per_hour']:.1f} 문서/시간")
+    print(f"{'단계':<10}{'처리':>6}{'건너뜀':>8}{'실패':>6}{'작업자':>8}{'평균(s)':>10}{'문서/시간':>12}")
+    for stage, s in summary["stages"].items():
+        average = s["seconds"] / s["done"] if s["done"] else 0.0
+        rate = f"{s['docs_per_hour']:.1f}" if s["docs_per_hour"] else "-"
+        print(f"{stage:<10}{s['done']:>6}{s['skipped']:>8}{s['failed']:>6}{s['workers']:>8}{average:>10.1f}{rate:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF 일괄 OCR/번역/PDF 변환")
+    parser.add_argument("input_dir", nargs="?", default=None, help="PDF가 들어 있는 디렉토리 (하위 폴더 포함)")
+    parser.add_argument("--manifest", default=None, help="PDF 경로 목록 파일 (한 줄에 하나, #은 주석)")
+    parser.add_argument("--output-dir", default=os.path.join(BASE_DIR, "outputs"))
+    parser.add_argument("--ocr-workers", type=int, default=1)
+    parser.add_argument("--ocr-shard-workers", type=int, default=1, help="문서 하나를 페이지 구간으로 나눠 분석할 프로세스 수")
+    parser.add_argument("--pdf-workers", type=int, default=2)
+    parser.add_argument("--no-pdf", action="store_true", help="PDF 변환 단계 생략")
+    parser.add_argument("--model", default="aeolian83/mbart-en-ko-ptt-latex")
+    parser.add_argument("--device", default=None, help="기본: GPU가 있으면 cuda, 없으면 cpu")
+    parser.add_argument("--backend", default=None, choices=["torch", "int8", "onnx"], help="기본: cuda는 torch, cpu는 int8")
+    parser.add_argument("--policy", default="quality")
+    parser.add_argument("--server-url", default=None, help="번역 서버 주소 (주어지면 모델을 직접 올리지 않음)")
+    parser.add_argument("--memory", default=os.path.join(BASE_DIR, "cache", "translation_memory.sqlite"), help="번역 메모리 SQLite 경로 (빈 문자열이면 사용 안 함)")
+    parser.add_argument("--batch-budget", default=os.path.join(BASE_DIR, "cache", "batch_budget.json"))
+    parser.add_argument("--summary", default=None, help="처리량 요약 JSON 경로 (선택)")
+    args = parser.parse_args()
+
+    pdfs = collect_pdfs(args.input_dir, args.manifest)
+    if not pdfs:
+        parser.error("처리할 PDF가 없습니다 (input_dir 또는 --manifest 지정)")
+    # 파일명이 같은 PDF는 같은 출력 폴더를 쓰므로 처음 것만 처리
+    by_name = {}
+    for pdf_path in pdfs:
+        doc = get_document_paths(pdf_path, args.output_dir)
+        if doc["name"] in by_name:
+            print(f"경고: 파일명이 같은 PDF는 건너뜁니다: {pdf_path}")
+            continue
+        by_name[doc["name"]] = (doc, pdf_path)
+    documents = [doc for doc, _ in by_name.values()]
+    pdfs = [pdf_path for _, pdf_path in by_name.values()]
+    print(f"PDF {len(pdfs)}개 → {args.output_dir}")
+
+    # CUDA를 초기화한 프로세스를 fork하지 않도록 spawn으로 풀 생성 (모델 로드보다 먼저)
+    context = multiprocessing.get_context("spawn")
+    # OCR 작업 프로세스는 모델을 한 번만 올리고 문서를 계속 받아 처리 (죽으면 다시 시작하고 그 문서를 재시도)
+    ocr_pool = OCRWorkerPool(num_workers=args.ocr_workers)
+    pdf_pool = None if args.no_pdf else ProcessPoolExecutor(max_workers=args.pdf_workers, mp_context=context)
+    stats = BatchStats()
+
+    # 번역 모델은 메인 프로세스에 하나만 올림
+    from md_translate import md_translate_to_html
+    from translation_memory import TranslationMemory
+    from translation_metrics import TranslationMetrics
+    from batch_budget import BatchBudget
+
+    model, tokenizer = None, None
+    device = args.device
+    if device is None:
+        import torch
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    if not args.server_url:
+        from model_registry import get_model_registry
+        backend = args.backend or ("torch" if str(device).startswith("cuda") else "int8")
+        model, tokenizer = get_model_registry().get(args.model, device=device, backend=backend)
+    memory = TranslationMemory(args.memory) if args.memory else None
+    budget = BatchBudget(args.batch_budget) if args.batch_budget else None
+
+    pdf_futures = {}
+
+    def submit_pdf(doc):
+        if pdf_pool is None:
+            return
+        if os.path.exists(doc["pdf_path"]):
+            stats.skipped("pdf")
+            return
+        pdf_futures[pdf_pool.submit(run_pdf, doc)] = doc
+
+    def translate(doc):
+        if os.path.exists(doc["html_path"]):
+            stats.skipped("translate")
+            submit_pdf(doc)
+            return
+        start = time.perf_counter()
+        try:
+            metrics = TranslationMetrics(device=device)
+            html = md_translate_to_html(
+                doc["md_path"], model, tokenizer, device=device, memory=memory, policy=args.policy,
+                server_url=args.server_url, resume=True, metrics=metrics, budget=budget,
+            )
+            metrics.finish()
+            tmp_path = doc["html_path"] + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(html)
+            os.replace(tmp_path, doc["html_path"])
+            metrics.write_json(os.path.splitext(doc["html_path"])[0] + "_metrics.json")
+        except Exception as e:
+            traceback.print_exc()
+            stats.failed("translate", doc["name"], f"{type(e).__name__}: {e}")
+            return
+        stats.done("translate", time.perf_counter() - start)
+        print(f"[translate] {doc['name']} ({time.perf_counter() - start:.1f}s)")
+        submit_pdf(doc)
+
+    try:
+        # OCR이 끝난 문서부터 번역하고, 번역이 끝나면 PDF 변환을 풀에 넘김
+        ocr_futures = {}
+        ocr_done = []
+        for doc, pdf_path in zip(documents, pdfs):
+            if os.path.exists(doc["md_path"]):
+                stats.skipped("ocr")
+                ocr_done.append(doc)
+            else:
+                ocr_futures[ocr_pool.submit(run_ocr, pdf_path, doc, args.ocr_shard_workers)] = doc
+        # OCR 작업을 모두 넣은 뒤에 이미 OCR된 문서를 번역해야 재실행 때도 OCR과 번역이 겹쳐서 진행
+        for doc in ocr_done:
+            translate(doc)
+        for future in as_completed(ocr_futures):
+            doc = ocr_futures[future]
+            try:
+                seconds = future.result()
+            except Exception as e:
+                stats.failed("ocr", doc["name"], f"{type(e).__name__}: {e}")
+                continue
+            stats.done("ocr", seconds)
+            print(f"[ocr] {doc['name']} ({seconds:.1f}s)")
+            translate(doc)
+        for future in as_completed(pdf_futures):
+            doc = pdf_futures[future]
+            try:
+                seconds = future.result()
+            except Exception as e:
+                stats.failed("pdf", doc["name"], f"{type(e).__name__}: {e}")
+                continue
+            stats.done("pdf", seconds)
+            print(f"[pdf] {doc['name']} ({seconds:.1f}s)")
+    finally:
+        ocr_pool.shutdown(cancel_futures=True)
+        if pdf_pool is not None:
+            pdf_pool.shutdown(cancel_futures=True)
+
+    workers = {"ocr": args.ocr_workers, "translate": 1, "pdf": 0 if args.no_pdf else args.pdf_workers}
+    summary = stats.summary(documents, workers, final_output="html_path" if args.no_pdf else "pdf_path")
+    print_summary(summary)
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"요약 저장: {args.summary}")
+    return 1 if summary["failures"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
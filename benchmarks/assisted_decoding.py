@@ -0,0 +1,129 @@
+# assisted_decoding.py
+# 논문 코퍼스(outputs/*/markdown/output.md)의 문단으로 assisted decoding의 수락률과 속도 향상을 측정
+# - greedy: 번역 모델만으로 greedy 디코딩 (fast 정책)
+# - assisted: 초안 모델이 토큰을 제안하고 번역 모델이 검증 (assisted 정책, 결과는 greedy와 같아야 함)
+# - 수락률: greedy 결과를 teacher forcing으로 넣었을 때 초안 모델의 argmax가 번역 모델의 토큰과 일치하는 비율
+#
+# 사용 예:
+#   python benchmarks/assisted_decoding.py --draft-model <작은 mbart 체크포인트> --device cuda --limit 200
+
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+
+import torch
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BASE_DIR)
+
+from md_translate import (
+    load_mbart_model,
+    get_draft_model,
+    get_md_parser,
+    collect_translation_units,
+    mask_protected_spans,
+    is_translatable,
+    encode_batch,
+    generate_batch,
+    get_decoding_policy,
+)
+
+
+def load_corpus(pattern, limit):
+    """코퍼스 문서의 번역 단위(문단)를 마스킹한 뒤 중복 없이 최대 limit개 반환"""
+    md = get_md_parser()
+    texts = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, "r", encoding="utf-8") as f:
+            tokens = md.parse(f.read())
+        for unit in collect_translation_units(tokens):
+            masked, _ = mask_protected_spans(unit.source)
+            if is_translatable(masked):
+                texts.append(masked)
+    return list(dict.fromkeys(texts))[:limit]
+
+
+def draft_agreement(inputs, generated_tokens, draft_model, pad_token_id):
+    """greedy 결과를 초안 모델에 teacher forcing으로 넣어 (일치 토큰 수, 전체 토큰 수) 반환 (강제 언어 토큰 제외)"""
+    decoder_input_ids = generated_tokens[:, :-1]
+    labels = generated_tokens[:, 1:]
+    with torch.no_grad():
+        logits = draft_model(**inputs, decoder_input_ids=decoder_input_ids).logits
+    predicted = logits.argmax(-1)
+    mask = labels != pad_token_id
+    mask[:, 0] = False
+    return int(((predicted == labels) & mask).sum()), int(mask.sum())
+
+
+def timed_generate(inputs, model, forced_bos_token_id, policy, device):
+    if str(device).startswith("cuda"):
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    generated_tokens, _ = generate_batch(inputs, model, forced_bos_token_id, policy)
+    if str(device).startswith("cuda"):
+        torch.cuda.synchronize()
+    return generated_tokens, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="assisted decoding 수락률/속도 벤치마크")
+    parser.add_argument("--model", default="aeolian83/mbart-en-ko-ptt-latex")
+    parser.add_argument("--draft-model", required=True, help="같은 토크나이저를 쓰는 작은 초안 모델")
+    parser.add_argument("--device", default="cuda")
+    parser.add_argument("--backend", default="torch", choices=["torch", "int8"])
+    parser.add_argument("--corpus", default=os.path.join(BASE_DIR, "outputs", "*", "markdown", "output.md"))
+    parser.add_argument("--limit", type=int, default=100, help="측정할 문단 수")
+    parser.add_argument("--max-length", type=int, default=512)
+    parser.add_argument("--output", default=None, help="결과 JSON 경로 (선택)")
+    args = parser.parse_args()
+
+    model, tokenizer = load_mbart_model(args.model, device=args.device, backend=args.backend, draft_model_name=args.draft_model)
+    draft_model = get_draft_model(model)
+    forced_bos_token_id = tokenizer.convert_tokens_to_ids("ko_KR")
+    greedy = get_decoding_policy("fast", max_length=args.max_length)
+    assisted = get_decoding_policy("assisted", max_length=args.max_length)
+
+    texts = load_corpus(args.corpus, args.limit)
+    print(f"문단 {len(texts)}개 측정")
+    # assisted generation은 문장 단위이므로 greedy도 문장 단위로 비교
+    totals = {"greedy_seconds": 0.0, "assisted_seconds": 0.0, "accepted": 0, "proposed": 0, "identical": 0, "target_tokens": 0}
+    for text in texts:
+        inputs = encode_batch([text], tokenizer, max_length=args.max_length).to(args.device)
+        greedy_tokens, greedy_seconds = timed_generate(inputs, model, forced_bos_token_id, greedy, args.device)
+        assisted_tokens, assisted_seconds = timed_generate(inputs, model, forced_bos_token_id, assisted, args.device)
+        accepted, proposed = draft_agreement(inputs, greedy_tokens, draft_model, tokenizer.pad_token_id)
+        totals["greedy_seconds"] += greedy_seconds
+        totals["assisted_seconds"] += assisted_seconds
+        totals["accepted"] += accepted
+        totals["proposed"] += proposed
+        totals["identical"] += int(torch.equal(greedy_tokens.cpu(), assisted_tokens.cpu()))
+        totals["target_tokens"] += int((greedy_tokens != tokenizer.pad_token_id).sum())
+
+    report = {
+        "model": args.model,
+        "draft_model": args.draft_model,
+        "device": args.device,
+        "backend": args.backend,
+        "paragraphs": len(texts),
+        **totals,
+        "accept_rate": totals["accepted"] / totals["proposed"] if totals["proposed"] else 0.0,
+        "speedup": totals["greedy_seconds"] / totals["assisted_seconds"] if totals["assisted_seconds"] else 0.0,
+        "identical_rate": totals["identical"] / len(texts) if texts else 0.0,
+    }
+    print(
+        f"greedy {report['greedy_seconds']:.1f}s, assisted {report['assisted_seconds']:.1f}s "
+        f"(속도 향상 x{report['speedup']:.2f}), 수락률 {report['accept_rate']:.1%}, "
+        f"greedy와 동일한 출력 {report['identical']}/{len(texts)}"
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"결과 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
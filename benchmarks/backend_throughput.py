@@ -0,0 +1,84 @@
+# backend_throughput.py
+# 같은 문서를 fp32(torch) / int8 / onnx backend로 번역해 처리량을 비교
+#
+# 사용 예:
+#   python benchmarks/backend_throughput.py outputs/the-illusion-of-thinking_20250613_230607/markdown/output.md \
+#       --backends torch int8 --device cpu --output bench_backends.json
+
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from md_translate import load_mbart_model, get_md_parser, collect_translation_units, get_token_lengths, translate_texts
+
+MODEL_NAME = "aeolian83/mbart-en-ko-ptt-latex"
+
+
+def load_document_texts(md_path, limit=None):
+    """문서의 번역 단위(문단) 문자열을 문서 순서대로 반환"""
+    md = get_md_parser()
+    with open(md_path, "r", encoding="utf-8") as f:
+        tokens = md.parse(f.read())
+    texts = [u.source for u in collect_translation_units(tokens)]
+    return texts[:limit] if limit else texts
+
+
+def run_backend(backend, texts, model_name, device, cache_dir=None):
+    """backend 하나로 texts 전체를 번역하고 시간/처리량 반환"""
+    load_start = time.perf_counter()
+    model, tokenizer = load_mbart_model(model_name, device=device, backend=backend, cache_dir=cache_dir)
+    load_time = time.perf_counter() - load_start
+
+    source_tokens = sum(get_token_lengths(texts, tokenizer))
+    start = time.perf_counter()
+    translations = translate_texts(texts, model, tokenizer, device=device)
+    elapsed = time.perf_counter() - start
+    return {
+        "backend": backend,
+        "device": device,
+        "load_seconds": load_time,
+        "translate_seconds": elapsed,
+        "texts": len(texts),
+        "source_tokens": source_tokens,
+        "texts_per_second": len(texts) / elapsed if elapsed else 0.0,
+        "source_tokens_per_second": source_tokens / elapsed if elapsed else 0.0,
+        "sample": translations[:3],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="backend별 번역 처리량 비교")
+    parser.add_argument("md_path")
+    parser.add_argument("--backends", nargs="+", default=["torch", "int8"], choices=["torch", "int8", "onnx"])
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--limit", type=int, default=None, help="앞에서부터 N개의 문단만 사용")
+    parser.add_argument("--cache-dir", default=None)
+    parser.add_argument("--output", default=None, help="결과 JSON 저장 경로")
+    args = parser.parse_args()
+
+    texts = load_document_texts(args.md_path, args.limit)
+    results = [run_backend(b, texts, args.model, args.device, args.cache_dir) for b in args.backends]
+
+    # fp32(torch) 대비 속도 향상 배율
+    baseline = next((r for r in results if r["backend"] == "torch"), None)
+    for r in results:
+        if baseline:
+            r["speedup_vs_torch"] = baseline["translate_seconds"] / r["translate_seconds"]
+        print(
+            f"{r['backend']:>6}: 로드 {r['load_seconds']:.1f}s, 번역 {r['translate_seconds']:.1f}s, "
+            f"{r['source_tokens_per_second']:.1f} tok/s"
+            + (f", torch 대비 {r['speedup_vs_torch']:.2f}x" if baseline else "")
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"md_path": args.md_path, "model": args.model, "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# import_profile.py
+# 모듈별 import 시간을 `python -X importtime`으로 측정해 표로 출력 (모듈마다 새 프로세스에서 측정)
+# home.py 첫 화면에서 import하는 모듈과, 처음 사용할 때까지 미루는 무거운 모듈을 나눠서 보여줌
+#
+# 사용 예:
+#   python benchmarks/import_profile.py
+#   python benchmarks/import_profile.py --modules md_translate transform_html --top 15 --output import_profile.json
+
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+
+# home.py가 첫 화면을 그리기 전에 import하는 모듈
+STARTUP_MODULES = [
+    "streamlit", "lazy_module", "decoding_policy", "translation_memory", "translation_metrics",
+    "batch_budget", "ocr_cache", "ocr_worker", "job_queue",
+]
+# LazyModule 뒤로 미루거나 처음 사용할 때 import하는 모듈
+LAZY_MODULES = ["md_translate", "model_registry", "transform_html", "pdf_pipeline", "ocr_pdf"]
+
+# "import time: self [us] | cumulative | imported package" 형식의 줄
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S.*)$")
+
+
+def profile_import(module_name):
+    """
+    module_name을 새 인터프리터에서 import하고 (성공 여부, 전체 초, [(모듈, 누적 초, 깊이)]) 반환
+    깊이 0은 직접 import한 모듈, 1 이상은 그 모듈이 끌어온 하위 import
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        cwd=BASE_DIR, capture_output=True, text=True,
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            cumulative_us, indent, name = int(match.group(2)), match.group(3), match.group(4).strip()
+            entries.append((name, cumulative_us / 1e6, (len(indent) - 1) // 2))
+    # importtime은 하위 import를 부모보다 먼저 출력하므로 대상 모듈 줄 바로 앞의 항목만 남김
+    # (인터프리터 시작 때 import되는 site, encodings 등 제외)
+    end = next((i for i in range(len(entries) - 1, -1, -1) if entries[i][0] == module_name and entries[i][2] == 0), None)
+    total = None
+    if end is not None:
+        total = entries[end][1]
+        start = end
+        while start > 0 and entries[start - 1][2] > 0:
+            start -= 1
+        entries = entries[start:end]
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "unknown error"
+        return False, total, entries, error
+    return True, total, entries, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="모듈 import 시간 측정")
+    parser.add_argument("--modules", nargs="+", default=None, help="측정할 모듈 (기본: home.py 시작 모듈 + 지연 모듈)")
+    parser.add_argument("--top", type=int, default=8, help="모듈마다 보여줄 무거운 하위 import 개수")
+    parser.add_argument("--output", default=None, help="결과 JSON 경로 (선택)")
+    args = parser.parse_args()
+
+    groups = [("직접 지정", args.modules)] if args.modules else [("시작 시 import", STARTUP_MODULES), ("지연 import", LAZY_MODULES)]
+    report = {"python": sys.version.split()[0], "groups": {}}
+    for title, modules in groups:
+        print(f"== {title} ==")
+        group_total = 0.0
+        rows = []
+        for module_name in modules:
+            ok, total, entries, error = profile_import(module_name)
+            # 최상위(하위 import 중 깊이 1)의 무거운 패키지
+            heavy = sorted((e for e in entries if e[2] == 1), key=lambda e: -e[1])[:args.top]
+            rows.append({
+                "module": module_name,
+                "ok": ok,
+                "seconds": total,
+                "error": error,
+                "heaviest": [{"module": name, "seconds": seconds} for name, seconds, _ in heavy],
+            })
+            if not ok:
+                print(f"{module_name:<24} import 실패: {error}")
+                continue
+            group_total += total or 0.0
+            print(f"{module_name:<24} {total:7.3f}s")
+            for name, seconds, _ in heavy:
+                print(f"    {name:<36} {seconds:7.3f}s")
+        # 같은 패키지를 여러 모듈이 공유하므로 합계는 상한값
+        print(f"합계(상한): {group_total:.3f}s\n")
+        report["groups"][title] = rows
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"결과 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# ocr_scaling.py
+# 페이지 분할 OCR(ocr_pdf(num_workers=N))의 작업 프로세스 수별 처리 시간과 속도 향상을 측정
+# - analyze: 모델 분석 단계(analyze_pdf)만의 시간 (작업 프로세스 시작과 모델 로드 포함)
+# - total: 마크다운/이미지 저장까지 포함한 ocr_pdf 전체 시간
+# - identical: 작업 프로세스 1개일 때와 마크다운이 같은지 (이미지 폴더 경로는 제외하고 비교)
+#
+# 사용 예:
+#   python benchmarks/ocr_scaling.py thesis.pdf --max-workers 8 --output ocr_scaling.json
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from magic_pdf.data.dataset import PymuDocDataset
+
+from ocr_pdf import ocr_pdf, analyze_pdf, classify_pages, get_mode_runs
+
+
+def run_workers(pdf_bytes, num_workers, work_dir):
+    """작업 프로세스 num_workers개로 분석 단계와 전체 OCR을 각각 실행해 (결과 dict, 마크다운) 반환"""
+    ds = PymuDocDataset(pdf_bytes)
+    page_modes = classify_pages(pdf_bytes)
+    start = time.perf_counter()
+    for run_start, run_end, use_ocr in get_mode_runs(page_modes, 0, len(ds) - 1):
+        analyze_pdf(ds, pdf_bytes, use_ocr, run_start, run_end, num_workers=num_workers)
+    analyze_seconds = time.perf_counter() - start
+
+    image_dir = os.path.join(work_dir, f"workers_{num_workers}", "images")
+    md_dir = os.path.join(work_dir, f"workers_{num_workers}", "markdown")
+    start = time.perf_counter()
+    md_path = ocr_pdf(pdf_bytes, "bench.pdf", image_dir, md_dir, md_filename="output.md", num_workers=num_workers)
+    total_seconds = time.perf_counter() - start
+    with open(md_path, "r", encoding="utf-8") as f:
+        markdown = f.read().replace(image_dir, "<images>")
+    return {
+        "workers": num_workers,
+        "pages": len(ds),
+        "analyze_seconds": analyze_seconds,
+        "total_seconds": total_seconds,
+        "pages_per_second": len(ds) / total_seconds if total_seconds else 0.0,
+    }, markdown
+
+
+def main():
+    parser = argparse.ArgumentParser(description="페이지 분할 OCR 작업 프로세스 수별 확장성 벤치마크")
+    parser.add_argument("pdf_path")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--workers", type=int, nargs="+", default=None, help="측정할 작업 프로세스 수 (기본: 1, 2, 4, ... max-workers)")
+    parser.add_argument("--output", default=None, help="결과 JSON 경로 (선택)")
+    args = parser.parse_args()
+
+    worker_counts = args.workers
+    if worker_counts is None:
+        worker_counts = []
+        n = 1
+        while n < args.max_workers:
+            worker_counts.append(n)
+            n *= 2
+        worker_counts.append(args.max_workers)
+    if worker_counts[0] != 1:
+        # 속도 향상과 결과 비교의 기준
+        worker_counts.insert(0, 1)
+
+    with open(args.pdf_path, "rb") as f:
+        pdf_bytes = f.read()
+
+    work_dir = tempfile.mkdtemp(prefix="ocr_scaling_")
+    results = []
+    baseline_markdown = None
+    try:
+        for num_workers in worker_counts:
+            result, markdown = run_workers(pdf_bytes, num_workers, work_dir)
+            if baseline_markdown is None:
+                baseline_markdown = markdown
+            result["speedup"] = results[0]["total_seconds"] / result["total_seconds"] if results else 1.0
+            result["identical"] = markdown == baseline_markdown
+            results.append(result)
+            print(
+                f"작업 프로세스 {num_workers}개: 분석 {result['analyze_seconds']:.1f}s, 전체 {result['total_seconds']:.1f}s "
+                f"({result['pages_per_second']:.2f} 페이지/s, x{result['speedup']:.2f}), "
+                f"결과 {'동일' if result['identical'] else '다름'}"
+            )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"pdf_path": args.pdf_path, "cpu_count": os.cpu_count(), "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"결과 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
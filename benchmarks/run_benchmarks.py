@@ -0,0 +1,152 @@
+# run_benchmarks.py
+# 마크다운 파싱 → 번역 단위(문단) 수집 → 번역 → HTML 렌더링 → 수식 변환 → PDF 출력 단계별 시간을 측정해 JSON으로 저장
+# 기본은 결정적 가짜 모델(stub_translator)이라 CPU/오프라인에서 실행되며, --model로 실제 (작은) 모델도 사용 가능
+#
+# 사용 예:
+#   python benchmarks/run_benchmarks.py --scales 1 4 16 --output bench_output.json
+#   python benchmarks/run_benchmarks.py --model <작은 mbart 체크포인트> --device cpu --scales 1
+
+import os
+import re
+import sys
+import json
+import glob
+import time
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from md_translate import get_md_parser, collect_translation_units, replace_text_tokens
+from translation_metrics import TranslationMetrics
+from stub_translator import StubModel, StubTokenizer
+
+DEFAULT_DOC = sorted(glob.glob(os.path.join(BASE_DIR, "outputs", "the-illusion-of-thinking_*", "markdown", "output.md")))[0]
+
+
+def make_scaled_document(md_text, scale):
+    """
+    문서를 scale번 이어 붙인 합성 문서 생성
+    복사본마다 문단 앞에 다른 접두어를 붙여 중복 제거/캐시 때문에 번역량이 줄지 않도록 함
+    """
+    copies = [md_text]
+    for k in range(1, scale):
+        copies.append(re.sub(r"(?m)^(?=[A-Za-z])", f"Variant {k}: ", md_text))
+    return "\n\n".join(copies)
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def run_once(md_text, model, tokenizer, device, policy, image_dir, pdf):
+    """한 문서에 대해 단계별 시간(초)과 번역 지표 반환"""
+    stages = {}
+    md = get_md_parser()
+    env = {}
+    tokens, stages["parse"] = timed(md.parse, md_text, env)
+    units, stages["collect"] = timed(collect_translation_units, tokens)
+
+    metrics = TranslationMetrics(device=device)
+    _, stages["translate"] = timed(replace_text_tokens, tokens, model, tokenizer, device=device, policy=policy, metrics=metrics)
+    metrics.finish()
+    html, stages["render"] = timed(md.renderer.render, tokens, md.options, env)
+
+    # transform_html은 weasyprint/bs4가 필요하므로 없으면 건너뜀 (weasyprint는 시스템 라이브러리가 없으면 OSError)
+    try:
+        from bs4 import BeautifulSoup
+        from transform_html import convert_latex_to_images_in_soup, html_to_pdf_with_weasyprint
+    except (ImportError, OSError) as e:
+        stages["math"] = None
+        stages["pdf"] = None
+        print(f"수식/PDF 단계 건너뜀: {e}")
+    else:
+        _, stages["math"] = timed(lambda: str(convert_latex_to_images_in_soup(BeautifulSoup(html, "html.parser"))))
+        if pdf:
+            # 수식 이미지는 외부 URL이라 PDF 단계는 render_math=False로 오프라인 측정
+            with tempfile.TemporaryDirectory() as tmp:
+                _, stages["pdf"] = timed(html_to_pdf_with_weasyprint, html, os.path.join(tmp, "bench.pdf"), base_dir=image_dir, render_math=False)
+        else:
+            stages["pdf"] = None
+    return stages, len(units), metrics.summary()
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=BASE_DIR, text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="번역 파이프라인 단계별 벤치마크")
+    parser.add_argument("--doc", default=DEFAULT_DOC, help="기준 마크다운 문서")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 4], help="합성 문서 배율")
+    parser.add_argument("--repeat", type=int, default=3, help="반복 횟수 (단계별 중앙값 사용)")
+    parser.add_argument("--model", default=None, help="실제 모델 이름 (없으면 가짜 모델)")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--policy", default="quality")
+    parser.add_argument("--stub-seconds-per-token", type=float, default=2e-6)
+    parser.add_argument("--no-pdf", action="store_true", help="WeasyPrint PDF 단계 생략")
+    parser.add_argument("--output", default=os.path.join(BASE_DIR, "bench_output.json"))
+    args = parser.parse_args()
+
+    if args.model:
+        from md_translate import load_mbart_model
+        model, tokenizer = load_mbart_model(args.model, device=args.device)
+    else:
+        model, tokenizer = StubModel(seconds_per_token=args.stub_seconds_per_token), StubTokenizer()
+
+    with open(args.doc, "r", encoding="utf-8") as f:
+        base_text = f.read()
+    image_dir = os.path.join(os.path.dirname(os.path.dirname(args.doc)), "images")
+
+    documents = []
+    for scale in args.scales:
+        md_text = make_scaled_document(base_text, scale)
+        runs = []
+        for _ in range(args.repeat):
+            stages, n_texts, translation = run_once(md_text, model, tokenizer, args.device, args.policy, image_dir, not args.no_pdf)
+            runs.append((stages, translation))
+        stage_names = runs[0][0].keys()
+        median_stages = {
+            name: statistics.median(r[0][name] for r in runs) if runs[0][0][name] is not None else None
+            for name in stage_names
+        }
+        documents.append({
+            "name": os.path.basename(os.path.dirname(os.path.dirname(args.doc))),
+            "scale": scale,
+            "chars": len(md_text),
+            "translation_units": n_texts,
+            "stages_seconds": median_stages,
+            "total_seconds": sum(v for v in median_stages.values() if v is not None),
+            "translation": runs[-1][1],
+        })
+        print(f"x{scale}: " + ", ".join(f"{k} {v:.3f}s" for k, v in median_stages.items() if v is not None))
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "model": args.model or "stub",
+        "device": args.device,
+        "policy": args.policy,
+        "repeat": args.repeat,
+        "documents": documents,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"결과 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
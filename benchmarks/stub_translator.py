@@ -0,0 +1,80 @@
+# stub_translator.py
+# 네트워크/GPU 없이 md_translate 파이프라인을 벤치마크하기 위한 결정적(deterministic) 가짜 모델과 토크나이저
+# translate_batch가 기대하는 인터페이스(__call__, batch_decode, lang_code_to_id, generate)만 흉내 냄
+
+import re
+import time
+
+import torch
+
+WORD_RE = re.compile(r"\w+|[^\w\s]")
+
+
+class StubEncoding(dict):
+    """BatchEncoding처럼 .to(device)를 지원하는 dict"""
+
+    def to(self, device):
+        return StubEncoding({k: v.to(device) for k, v in self.items()})
+
+
+class StubTokenizer:
+    """단어/구두점 단위로 id를 부여하는 토크나이저 (같은 입력이면 항상 같은 id)"""
+
+    pad_token_id = 1
+    eos_token_id = 2
+    lang_code_to_id = {"ko_KR": 3}
+
+    def __init__(self):
+        self.vocab = {}
+        self.words = {}
+
+    def _encode(self, text, max_length=None):
+        ids = []
+        for word in WORD_RE.findall(text):
+            if word not in self.vocab:
+                self.vocab[word] = len(self.vocab) + 10
+                self.words[self.vocab[word]] = word
+            ids.append(self.vocab[word])
+        if max_length is not None:
+            ids = ids[:max_length - 1]
+        return ids + [self.eos_token_id]
+
+    def convert_tokens_to_ids(self, token):
+        return self.lang_code_to_id.get(token, 0)
+
+    def __call__(self, texts, return_tensors=None, padding=False, truncation=False, max_length=None):
+        ids = [self._encode(t, max_length if truncation else None) for t in texts]
+        masks = [[1] * len(i) for i in ids]
+        if padding:
+            width = max(len(i) for i in ids)
+            ids = [i + [self.pad_token_id] * (width - len(i)) for i in ids]
+            masks = [m + [0] * (width - len(m)) for m in masks]
+        if return_tensors == "pt":
+            return StubEncoding(input_ids=torch.tensor(ids), attention_mask=torch.tensor(masks))
+        return {"input_ids": ids, "attention_mask": masks}
+
+    def batch_decode(self, sequences, skip_special_tokens=True):
+        decoded = []
+        for seq in sequences:
+            seq = seq.tolist() if hasattr(seq, "tolist") else seq
+            decoded.append(" ".join(self.words[i] for i in seq if i >= 10))
+        return decoded
+
+
+class StubModel:
+    """
+    입력을 그대로 '번역'으로 돌려주는 가짜 seq2seq 모델
+    seconds_per_token × (패딩 포함 입력 토큰 수) × num_beams 만큼 대기해 배치/패딩에 비례하는 비용을 흉내 냄
+    """
+
+    name_or_path = "stub-translator"
+
+    def __init__(self, seconds_per_token=2e-6):
+        self.seconds_per_token = seconds_per_token
+        self.device = torch.device("cpu")
+
+    def generate(self, input_ids=None, attention_mask=None, forced_bos_token_id=None, num_beams=1, **kwargs):
+        if self.seconds_per_token:
+            time.sleep(self.seconds_per_token * input_ids.numel() * num_beams)
+        bos = torch.full((input_ids.shape[0], 1), forced_bos_token_id or 0, dtype=input_ids.dtype)
+        return torch.cat([bos, input_ids], dim=1)
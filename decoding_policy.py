@@ -0,0 +1,72 @@
+# decoding_policy.py
+# torch/transformers 없이 import할 수 있도록 md_translate에서 분리한 디코딩 정책
+
+from dataclasses import dataclass, asdict
+
+# 디코딩 정책 (배치 입력 길이에 따라 beam 수와 생성 길이를 조절)
+@dataclass(frozen=True)
+class DecodingPolicy:
+    """
+    배치의 원문 토큰 길이가 short_input_tokens 이하이면 short_num_beams, 아니면 num_beams로 디코딩
+    max_new_tokens_ratio가 None이면 max_length까지 생성하고, 주어지면
+    원문 길이 × max_new_tokens_ratio + min_new_tokens 만큼만 생성 (max_length를 넘지 않음)
+    assisted=True이면 초안(draft) 모델이 제안한 토큰을 번역 모델이 검증하는 assisted decoding 사용
+    (greedy만 가능하므로 num_beams는 1, 초안 모델이 없으면 일반 greedy와 같음)
+    """
+    name: str = "quality"
+    num_beams: int = 5
+    short_num_beams: int = 5
+    short_input_tokens: int = 0
+    max_new_tokens_ratio: float = None
+    min_new_tokens: int = 16
+    max_length: int = 512
+    early_stopping: bool = False
+    assisted: bool = False
+
+    def generate_kwargs(self, source_length):
+        num_beams = self.short_num_beams if source_length <= self.short_input_tokens else self.num_beams
+        if self.assisted:
+            num_beams = 1
+        kwargs = {"num_beams": num_beams}
+        if self.max_new_tokens_ratio is None:
+            kwargs["max_length"] = self.max_length
+        else:
+            kwargs["max_new_tokens"] = min(self.max_length, int(source_length * self.max_new_tokens_ratio) + self.min_new_tokens)
+        if num_beams > 1 and self.early_stopping:
+            kwargs["early_stopping"] = True
+        return kwargs
+
+    def cache_settings(self):
+        """번역 메모리 키에 들어가는 설정 (정책 이름과, greedy 결과를 바꾸지 않는 assisted 여부는 제외)"""
+        settings = asdict(self)
+        settings.pop("name")
+        settings.pop("assisted")
+        return settings
+
+# 미리 정의된 디코딩 정책 (quality는 기존 num_beams=5, max_length=512와 동일)
+DECODING_POLICIES = {
+    "quality": DecodingPolicy(),
+    "balanced": DecodingPolicy(
+        name="balanced", num_beams=3, short_num_beams=1, short_input_tokens=24,
+        max_new_tokens_ratio=2.0, early_stopping=True,
+    ),
+    "fast": DecodingPolicy(
+        name="fast", num_beams=1, short_num_beams=1,
+        max_new_tokens_ratio=1.6, early_stopping=True,
+    ),
+    # fast와 번역 결과가 같고(번역 메모리 공유), 초안 모델이 로드되어 있으면 더 빠름
+    "assisted": DecodingPolicy(
+        name="assisted", num_beams=1, short_num_beams=1,
+        max_new_tokens_ratio=1.6, early_stopping=True, assisted=True,
+    ),
+}
+
+# 정책 이름/객체/None을 DecodingPolicy로 변환하는 함수
+def get_decoding_policy(policy=None, max_length=512):
+    if policy is None:
+        return DecodingPolicy(max_length=max_length)
+    if isinstance(policy, str):
+        if policy not in DECODING_POLICIES:
+            raise ValueError(f"알 수 없는 디코딩 정책입니다: {policy} (선택: {', '.join(DECODING_POLICIES)})")
+        return DECODING_POLICIES[policy]
+    return policy
@@ -1,33 +1,333 @@
 import streamlit as st
-from ocr_pdf import ocr_pdf
 import os
+import json
+import time
 from datetime import datetime
-from md_translate import setup_env, load_mbart_model, md_translate_to_html
-from transform_html import convert_html_to_pdf_with_math_images
+from lazy_module import LazyModule
+from decoding_policy import DECODING_POLICIES
+from translation_memory import TranslationMemory
+from translation_metrics import TranslationMetrics
+from batch_budget import BatchBudget
+from ocr_cache import OCRCache
+from ocr_worker import get_default_pool
+from job_queue import JobQueue, QUEUED, RUNNING, DONE, FAILED, CANCELLED
+
+# 무거운 모듈(torch/transformers, magic_pdf, weasyprint)은 처음 사용할 때 import
+# 기존 HTML만 둘러볼 때는 로드하지 않아 첫 화면이 빨리 뜸
+translator = LazyModule("md_translate")
+html_transform = LazyModule("transform_html")
+models = LazyModule("model_registry")
+pipeline = LazyModule("pdf_pipeline")
 
 # 환경설정 (옵션)
-setup_env("/mnt/t7/dnn/llm_practicing/.env")
+ENV_PATH = "/mnt/t7/dnn/llm_practicing/.env"
+if os.path.exists(ENV_PATH):
+    from dotenv import load_dotenv
+    load_dotenv(ENV_PATH)
 
 # 모델 및 토크나이저 로드
 MODEL_NAME = "aeolian83/mbart-en-ko-ptt-latex"
-DEVICE = "cuda"  # or "cpu"
+# sLM_fine_tuning 노트북에서 저장한 체크포인트 등 추가 모델 (쉼표로 구분한 경로/이름)
+EXTRA_MODELS = [m.strip() for m in os.environ.get("TRANSLATOR_MODELS", "").split(",") if m.strip()]
+
+# assisted decoding용 초안 모델 (선택, 번역 모델과 같은 토크나이저를 쓰는 작은 mBART)
+DRAFT_MODEL_NAME = os.environ.get("TRANSLATOR_DRAFT_MODEL")
+
+# 번역 서버(translate_server.py) 주소가 있으면 모델을 직접 올리지 않고 서버에 요청
+SERVER_URL = os.environ.get("TRANSLATOR_SERVER")  # 예: http://127.0.0.1:8765, unix:///tmp/translator.sock
 
-model, tokenizer = load_mbart_model(MODEL_NAME, device=DEVICE)
+# 번역 장치 결정 함수 (GPU가 없으면 CPU + int8 양자화 모델, 환경변수로 변경 가능)
+# torch import가 필요하므로 번역할 때만 호출
+def get_device_and_backend():
+    device = os.environ.get("TRANSLATOR_DEVICE")
+    if device is None:
+        import torch
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    backend = os.environ.get("TRANSLATOR_BACKEND", "torch" if str(device).startswith("cuda") else "int8")  # torch / int8 / onnx
+    return device, backend
+
+# 번역 모델 선택 (추가 모델이 있을 때만 표시)
+model_name = MODEL_NAME
+if EXTRA_MODELS and not SERVER_URL:
+    model_name = st.sidebar.selectbox("번역 모델", options=[MODEL_NAME] + EXTRA_MODELS)
+
+# 모델 로드 함수 (프로세스 단위 레지스트리에서 한 번만 로드, Streamlit 재실행 시 다시 로드하지 않음)
+def get_translator(model_name):
+    device, backend = get_device_and_backend()
+    if SERVER_URL:
+        return None, None, device
+    # trainer.save_model로 저장한 체크포인트에는 토크나이저가 없으므로 기본 모델의 토크나이저 사용
+    has_tokenizer = not os.path.isdir(model_name) or os.path.exists(os.path.join(model_name, "tokenizer_config.json"))
+    model, tokenizer = models.get_model_registry().get(
+        model_name, device=device, backend=backend,
+        tokenizer_name=None if has_tokenizer else MODEL_NAME,
+        draft_model_name=DRAFT_MODEL_NAME,
+    )
+    return model, tokenizer, device
 
 # 현재 스크립트의 절대 경로를 기준으로 디렉토리 설정
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 OUTPUTS_DIR = os.path.join(BASE_DIR, "outputs")
 HTML_DIR = os.path.join(BASE_DIR, "html")
 
+CACHE_DIR = os.path.join(BASE_DIR, "cache")
+JOBS_DIR = os.path.join(BASE_DIR, "jobs")
+
 # HTML 디렉토리가 없으면 생성
 os.makedirs(HTML_DIR, exist_ok=True)
 
+# 번역 메모리 캐시 (같은 문장/문서를 다시 번역하지 않도록, 재실행 간 공유)
+@st.cache_resource
+def get_translation_memory():
+    return TranslationMemory(os.path.join(CACHE_DIR, "translation_memory.sqlite"))
+
+translation_memory = get_translation_memory()
+
+# 이 장치/모델에서 메모리 부족 없이 처리한 배치 크기를 학습해 다음 실행에도 사용
+@st.cache_resource
+def get_batch_budget():
+    return BatchBudget(os.path.join(CACHE_DIR, "batch_budget.json"))
+
+batch_budget = get_batch_budget()
+
+# 같은 PDF(또는 일부 페이지만 바뀐 개정판)를 다시 올리면 OCR 결과를 재사용
+@st.cache_resource
+def get_ocr_cache():
+    # 큰 PDF는 페이지 구간을 OCR_WORKERS개 프로세스에서 나눠 분석 (프로세스마다 OCR 모델을 올림)
+    return OCRCache(os.path.join(CACHE_DIR, "ocr"), num_workers=int(os.environ.get("OCR_WORKERS", "1")))
+
+ocr_cache = get_ocr_cache()
+
+# OCR 작업 함수 (params: pdf_path, output_dir, translate, model_name, policy)
+def run_ocr_job(job, params):
+    output_img_dir = os.path.join(params["output_dir"], "images")
+    output_md_dir = os.path.join(params["output_dir"], "markdown")
+    with open(params["pdf_path"], "rb") as f:
+        pdf_bytes = f.read()
+    job.check_cancelled()
+    # OCR 후 바로 번역하도록 선택했으면 OCR이 끝난 페이지부터 번역 (OCR과 번역이 겹쳐서 진행)
+    if params.get("translate"):
+        return run_ocr_translate(job, params, pdf_bytes, output_img_dir, output_md_dir)
+    job.update(0.0, "OCR 처리 중")
+    md_path = ocr_cache.ocr_pdf(pdf_bytes, output_img_dir, output_md_dir, md_filename="output.md")
+    job.check_cancelled()
+    return {"md_path": md_path, "ocr_cache": ocr_cache.last_stats}
+
+# OCR+번역 스트리밍 함수 (페이지 묶음 단위로 OCR 결과를 바로 번역해 HTML에 이어서 기록)
+def run_ocr_translate(job, params, pdf_bytes, output_img_dir, output_md_dir):
+    job.update(0.0, "번역 모델 준비 중")
+    model, tokenizer, device = get_translator(params["model_name"])
+    job.check_cancelled()
+    metrics = TranslationMetrics(device=device)
+    folder = os.path.basename(params["output_dir"])
+    html_path = os.path.join(HTML_DIR, f"{folder}_translated.html")
+    part_path = html_path + ".part"
+
+    def on_progress(done, total):
+        job.update(done / total if total else 1.0, f"OCR/번역 중 ({done}/{total} 페이지)")
+
+    job.update(0.0, "OCR 처리 중")
+    with open(part_path, "w", encoding="utf-8") as f:
+        for _, _, html in pipeline.iter_pdf_translation(
+            pdf_bytes, output_img_dir, output_md_dir, model, tokenizer, on_progress=on_progress, ocr_cache=ocr_cache,
+            device=device, memory=translation_memory, policy=params["policy"], server_url=SERVER_URL,
+            metrics=metrics, budget=batch_budget,
+        ):
+            f.write(html)
+            f.flush()
+            job.check_cancelled()
+    os.replace(part_path, html_path)
+    metrics.finish()
+    metrics_path = os.path.splitext(html_path)[0] + "_metrics.json"
+    metrics.write_json(metrics_path)
+    return {
+        "md_path": os.path.join(output_md_dir, "output.md"),
+        "html_path": html_path,
+        "metrics_path": metrics_path,
+        "image_dir": output_img_dir,
+        "ocr_cache": ocr_cache.last_stats,
+    }
+
+# 번역 작업 함수 (params: md_path, html_path, model_name, policy)
+def run_translate_job(job, params):
+    job.update(0.0, "번역 모델 준비 중")
+    model, tokenizer, device = get_translator(params["model_name"])
+    job.check_cancelled()
+    metrics = TranslationMetrics(device=device)
+    # 번역 중인 HTML은 .part 파일에 이어서 기록 (작업 목록에서 미리보기)
+    part_path = params["html_path"] + ".part"
+
+    def on_progress(done, total):
+        job.update(done / total if total else 1.0, f"번역 중 ({done}/{total} 문단)")
+
+    with open(part_path, "w", encoding="utf-8") as f:
+        for fragment in translator.md_translate_to_html_stream(
+            params["md_path"], model, tokenizer, device=device, memory=translation_memory, policy=params["policy"],
+            server_url=SERVER_URL, resume=True, metrics=metrics, budget=batch_budget, on_progress=on_progress,
+        ):
+            f.write(fragment)
+            f.flush()
+            # 취소해도 체크포인트가 남아 다음 번역은 이어서 진행
+            job.check_cancelled()
+    os.replace(part_path, params["html_path"])
+    metrics.finish()
+    # 성능 리포트를 HTML 옆에 저장
+    metrics_path = os.path.splitext(params["html_path"])[0] + "_metrics.json"
+    metrics.write_json(metrics_path)
+    return {"html_path": params["html_path"], "metrics_path": metrics_path, "image_dir": params["image_dir"]}
+
+# PDF 변환 작업 함수 (params: html_path, pdf_path, base_dir)
+def run_pdf_job(job, params):
+    job.update(0.0, "PDF 변환 중")
+    with open(params["html_path"], "r", encoding="utf-8") as f:
+        html_content = f.read()
+    html_transform.convert_html_to_pdf_with_math_images(html_content, params["pdf_path"], base_dir=params["base_dir"])
+    return {"pdf_path": params["pdf_path"]}
+
+# 백그라운드 작업 큐 (Streamlit 재실행과 무관하게 작업 스레드에서 실행, 기록은 jobs/에 저장)
+@st.cache_resource
+def get_job_queue():
+    jobs = JobQueue(JOBS_DIR, handlers={"ocr": run_ocr_job, "translate": run_translate_job, "pdf": run_pdf_job})
+    jobs.start()
+    return jobs
+
+job_queue = get_job_queue()
+
+# 번역 작업 등록 함수 (outputs/<폴더>/markdown/output.md → html/<폴더>_translated.html)
+def submit_translate_job(jobs, md_path, model_name, policy):
+    output_dir = os.path.dirname(os.path.dirname(md_path))
+    folder = os.path.basename(output_dir)
+    return jobs.submit("translate", {
+        "md_path": md_path,
+        "html_path": os.path.join(HTML_DIR, f"{folder}_translated.html"),
+        "image_dir": os.path.join(output_dir, "images"),
+        "model_name": model_name,
+        "policy": policy,
+    }, title=f"번역: {folder}")
+
+# HTML 이미지 경로의 기준 폴더 반환 함수
+# 이미지 경로는 마크다운 파일 기준 상대 경로(../images/...)이므로 html/<폴더>_translated.html → outputs/<폴더>/markdown
+def get_html_base_dir(html_path):
+    name = os.path.basename(html_path)
+    if name.endswith("_translated.html"):
+        md_dir = os.path.join(OUTPUTS_DIR, name[:-len("_translated.html")], "markdown")
+        if os.path.isdir(md_dir):
+            return md_dir
+    # 이전 버전 HTML은 이미지 경로가 절대 경로라 기준 폴더와 관계없음
+    return OUTPUTS_DIR
+
+# PDF 변환 작업 등록 함수
+def submit_pdf_job(jobs, html_path):
+    pdf_path = os.path.splitext(html_path)[0] + ".pdf"
+    base_dir = get_html_base_dir(html_path)
+    return jobs.submit("pdf", {"html_path": html_path, "pdf_path": pdf_path, "base_dir": base_dir}, title=f"PDF: {os.path.basename(pdf_path)}")
+
 st.title("PDF OCR 및 마크다운 변환")
 
+# 디코딩 정책 선택 (quality: beam 5, balanced: 짧은 입력은 greedy, fast: 전부 greedy)
+decoding_policy = st.sidebar.selectbox(
+    "번역 디코딩 정책",
+    options=list(DECODING_POLICIES),
+    help="quality는 기존 방식(beam 5), balanced/fast는 품질을 약간 낮추는 대신 번역 속도가 빠릅니다. "
+         "assisted는 fast와 같은 결과를 초안 모델(TRANSLATOR_DRAFT_MODEL)로 더 빨리 만듭니다.",
+)
+
+# 상주 OCR 작업 프로세스 상태 (OCR_WORKER_POOL=작업 프로세스 수를 설정하면 앱 시작 때 OCR 모델을 미리 로드)
+ocr_pool = get_default_pool()
+if ocr_pool is not None:
+    with st.sidebar.expander("OCR 작업 프로세스"):
+        for worker in ocr_pool.health():
+            state = "로드 실패" if worker["failed"] else "준비됨" if worker["ready"] else "모델 로드 중"
+            if worker["busy"]:
+                state = "처리 중"
+            st.caption(f"#{worker['index']} {state} (처리 {worker['tasks_done']}건, 재시작 {worker['restarts']}회)")
+
+# 번역 성능 요약 표시 함수 (summary: TranslationMetrics.summary() 결과)
+def show_metrics_summary(summary):
+    cols = st.columns(4)
+    cols[0].metric("전체 시간", f"{summary['wall_seconds']:.1f}s")
+    cols[1].metric("generate 시간", f"{summary['generate_seconds']:.1f}s")
+    cols[2].metric("처리량", f"{summary['tokens_per_second']:.0f} tok/s")
+    cols[3].metric("패딩 비율", f"{summary['padding_ratio']:.1%}")
+    peak = summary["peak_memory_bytes"]
+    st.caption(
+        f"배치 {summary['batches']}개, 항목 {summary['items']}개, 원문 토큰 {summary['source_tokens']}개 → 번역 토큰 {summary['target_tokens']}개, "
+        f"토크나이즈 {summary['tokenize_seconds']:.1f}s, 디코드 {summary['decode_seconds']:.1f}s"
+        + (f", 최대 메모리 {peak / 2**20:.0f}MB" if peak else "")
+    )
+
+STATUS_LABELS = {QUEUED: "대기", RUNNING: "실행 중", DONE: "완료", FAILED: "실패", CANCELLED: "취소"}
+
+# 실행 중인 작업의 번역 중간 결과(.part) 경로
+def preview_path(job):
+    if job["kind"] == "translate":
+        return job["params"]["html_path"] + ".part"
+    folder = os.path.basename(job["params"]["output_dir"])
+    return os.path.join(HTML_DIR, f"{folder}_translated.html.part")
+
+# 작업 하나의 상태와 결과 표시 함수
+def show_job(job):
+    job_id = job["id"]
+    result = job["result"] or {}
+    with st.expander(f"[{STATUS_LABELS[job['status']]}] {job['title']}", expanded=job["status"] in (QUEUED, RUNNING)):
+        st.progress(job["progress"], text=job["message"])
+        if job["error"]:
+            st.error(job["error"])
+        cols = st.columns(2)
+        if job["status"] in (QUEUED, RUNNING):
+            if cols[0].button("취소", key=f"cancel_{job_id}"):
+                job_queue.cancel(job_id)
+                st.rerun()
+        elif cols[0].button("기록 삭제", key=f"remove_{job_id}"):
+            job_queue.remove(job_id)
+            st.rerun()
+
+        # 번역 중인 HTML 미리보기
+        if job["status"] == RUNNING and (job["kind"] == "translate" or job["params"].get("translate")):
+            part_path = preview_path(job)
+            if os.path.exists(part_path):
+                with open(part_path, "r", encoding="utf-8") as f:
+                    st.components.v1.html(f.read(), height=300, scrolling=True)
+        if job["status"] != DONE:
+            return
+
+        if result.get("ocr_cache"):
+            stats = result["ocr_cache"]
+            caption = f"OCR 캐시: {stats['pages']}페이지 중 {stats['cached_pages']}페이지 재사용"
+            # 페이지별 모드 분류 이전에 저장된 작업 기록에는 모드별 페이지 수가 없음
+            if stats.get("text_mode_pages") is not None and stats.get("ocr_mode_pages") is not None:
+                caption += f" (텍스트 추출 {stats['text_mode_pages']}페이지, OCR {stats['ocr_mode_pages']}페이지)"
+            st.caption(caption)
+        if job["kind"] == "ocr" and os.path.exists(result["md_path"]):
+            with open(result["md_path"], "r", encoding="utf-8") as f:
+                cols[1].download_button("변환된 마크다운 다운로드", f.read(), file_name="output.md", key=f"md_{job_id}")
+            if not job["params"].get("translate") and st.button("번역하기", key=f"translate_{job_id}"):
+                submit_translate_job(job_queue, result["md_path"], model_name, decoding_policy)
+                st.rerun()
+        if "html_path" in result:
+            if os.path.exists(result["metrics_path"]):
+                with open(result["metrics_path"], "r", encoding="utf-8") as f:
+                    show_metrics_summary(json.load(f)["summary"])
+            # 이전 버전처럼 PDF 버튼이 다른 버튼 안에 있지 않으므로 재실행 후에도 동작
+            if cols[1].button("PDF로 변환하기", key=f"pdf_{job_id}"):
+                submit_pdf_job(job_queue, result["html_path"])
+                st.rerun()
+        elif job["kind"] == "pdf" and os.path.exists(result["pdf_path"]):
+            with open(result["pdf_path"], "rb") as f:
+                cols[1].download_button("PDF 다운로드", f.read(), file_name=os.path.basename(result["pdf_path"]), mime="application/pdf", key=f"download_{job_id}")
+
+# 작업 목록
+st.subheader("작업 목록")
+jobs = job_queue.list_jobs(limit=20)
+if not jobs:
+    st.caption("등록된 작업이 없습니다.")
+for job in jobs:
+    show_job(job)
+
 # 기존 HTML 파일 목록 가져오기
 existing_html_files = []
 if os.path.exists(HTML_DIR):
-    for file in os.listdir(HTML_DIR):
+    for file in sorted(os.listdir(HTML_DIR)):
         if file.endswith('.html'):
             file_path = os.path.join(HTML_DIR, file)
             existing_html_files.append((file, file_path))
@@ -50,29 +350,15 @@ if existing_html_files:
         st.subheader("HTML 미리보기")
         st.components.v1.html(html_content, height=400, scrolling=True)
         
-        # PDF 변환 버튼
+        # PDF 변환 작업 등록 (결과는 작업 목록에서 다운로드)
         if st.button("선택한 HTML을 PDF로 변환"):
-            with st.spinner("PDF 변환 중입니다..."):
-                # PDF 파일 경로 설정
-                output_pdf = os.path.join(HTML_DIR, f"{os.path.splitext(selected_html)[0]}.pdf")
-                
-                # HTML을 PDF로 변환
-                convert_html_to_pdf_with_math_images(html_content, output_pdf, base_dir=os.path.join(BASE_DIR, "outputs"))
-                
-                # PDF 파일 다운로드 버튼
-                with open(output_pdf, "rb") as f:
-                    pdf_bytes = f.read()
-                st.download_button(
-                    "PDF 다운로드",
-                    pdf_bytes,
-                    file_name=f"{os.path.splitext(selected_html)[0]}.pdf",
-                    mime="application/pdf"
-                )
+            submit_pdf_job(job_queue, selected_html_path)
+            st.rerun()
 
 # 기존 outputs 폴더의 마크다운 파일 목록 가져오기
 existing_md_files = []
 if os.path.exists(OUTPUTS_DIR):
-    for folder in os.listdir(OUTPUTS_DIR):
+    for folder in sorted(os.listdir(OUTPUTS_DIR)):
         folder_path = os.path.join(OUTPUTS_DIR, folder)
         if os.path.isdir(folder_path):
             md_path = os.path.join(folder_path, "markdown", "output.md")
@@ -100,124 +386,37 @@ if existing_md_files:
         st.subheader("마크다운 일부 미리보기")
         st.markdown(md_content[:2000])  # 앞 2000글자만 보여줌
         
-        # 번역 버튼
+        # 번역 작업 등록 (진행 상황과 결과는 작업 목록에서 확인)
         if st.button("선택한 파일 번역하기"):
-            with st.spinner("번역 중입니다..."):
-                # HTML로 변환
-                html_content = md_translate_to_html(selected_md_path, model, tokenizer, device=DEVICE)
-                st.success("번역 완료!")
-                
-                # HTML 파일 저장
-                html_filename = f"{selected_folder}_translated.html"
-                html_path = os.path.join(HTML_DIR, html_filename)
-                with open(html_path, "w", encoding="utf-8") as f:
-                    f.write(html_content)
-                
-                # 번역된 HTML 미리보기
-                st.subheader("번역된 HTML 미리보기")
-                st.components.v1.html(html_content, height=400, scrolling=True)
-                
-                # PDF 변환 버튼
-                if st.button("PDF로 변환하기"):
-                    with st.spinner("PDF 변환 중입니다..."):
-                        # PDF 파일 경로 설정
-                        output_pdf = os.path.join(HTML_DIR, f"{os.path.splitext(html_filename)[0]}.pdf")
-                        
-                        # HTML을 PDF로 변환
-                        convert_html_to_pdf_with_math_images(html_content, output_pdf, base_dir=os.path.join(OUTPUTS_DIR, selected_folder, "images"))
-                        
-                        # PDF 파일 다운로드 버튼
-                        with open(output_pdf, "rb") as f:
-                            pdf_bytes = f.read()
-                        st.download_button(
-                            "번역된 PDF 다운로드",
-                            pdf_bytes,
-                            file_name=f"{os.path.splitext(html_filename)[0]}.pdf",
-                            mime="application/pdf"
-                        )
+            submit_translate_job(job_queue, selected_md_path, model_name, decoding_policy)
+            st.rerun()
 
 # 새로운 PDF 파일 업로드 섹션
 st.subheader("새로운 PDF 파일 업로드")
 uploaded_file = st.file_uploader("PDF 파일을 업로드하세요", type="pdf")
+translate_after_ocr = st.checkbox("OCR 후 바로 번역", value=True)
 
-# 세션 상태 초기화
-if 'pdf_bytes' not in st.session_state:
-    st.session_state.pdf_bytes = None
-if 'pdf_file_name' not in st.session_state:
-    st.session_state.pdf_file_name = None
-
-# 파일이 업로드되면 세션 상태에 저장
-if uploaded_file:
-    st.session_state.pdf_bytes = uploaded_file.read()
-    st.session_state.pdf_file_name = uploaded_file.name
-    st.success(f"파일 '{uploaded_file.name}'이(가) 업로드되었습니다.")
-
-# OCR 처리 버튼
-if st.session_state.pdf_bytes is not None:
-    if st.button("OCR 처리 시작"):
-        # 파일명에서 확장자 제거
-        base_filename = os.path.splitext(st.session_state.pdf_file_name)[0]
-        # 현재 날짜와 시간으로 폴더명 생성
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_dir = os.path.join(OUTPUTS_DIR, f"{base_filename}_{timestamp}")
-        
-        # 출력 디렉토리 생성
-        output_img_dir = os.path.join(output_dir, "images")
-        output_md_dir = os.path.join(output_dir, "markdown")
-        os.makedirs(output_img_dir, exist_ok=True)
-        os.makedirs(output_md_dir, exist_ok=True)
-
-        with st.spinner("OCR 처리 중입니다..."):
-            md_path = ocr_pdf(
-                st.session_state.pdf_bytes,
-                st.session_state.pdf_file_name,
-                output_img_dir,
-                output_md_dir,
-                md_filename="output.md"
-            )
-        st.success("OCR 및 변환 완료!")
-
-        # 변환된 md 파일 다운로드 버튼
-        with open(md_path, "r", encoding="utf-8") as f:
-            md_content = f.read()
-        st.download_button("변환된 마크다운 다운로드", md_content, file_name="output.md")
-
-        # 변환된 md 일부 미리보기
-        st.subheader("마크다운 일부 미리보기")
-        st.markdown(md_content[:2000])  # 앞 2000글자만 보여줌
+# OCR 작업 등록 (업로드한 PDF는 출력 폴더에 저장해 작업 스레드에서 읽음)
+if uploaded_file and st.button("OCR 처리 시작"):
+    # 파일명에서 확장자 제거
+    base_filename = os.path.splitext(uploaded_file.name)[0]
+    # 현재 날짜와 시간으로 폴더명 생성
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_dir = os.path.join(OUTPUTS_DIR, f"{base_filename}_{timestamp}")
+    os.makedirs(output_dir, exist_ok=True)
+    pdf_path = os.path.join(output_dir, uploaded_file.name)
+    with open(pdf_path, "wb") as f:
+        f.write(uploaded_file.getvalue())
+    job_queue.submit("ocr", {
+        "pdf_path": pdf_path,
+        "output_dir": output_dir,
+        "translate": translate_after_ocr,
+        "model_name": model_name,
+        "policy": decoding_policy,
+    }, title=f"OCR: {uploaded_file.name}")
+    st.rerun()
 
-        # 번역 버튼
-        if st.button("새 파일 번역하기"):
-            with st.spinner("번역 중입니다..."):
-                # HTML로 변환
-                html_content = md_translate_to_html(md_path, model, tokenizer, device=DEVICE)
-                st.success("번역 완료!")
-                
-                # HTML 파일 저장
-                html_filename = f"{base_filename}_{timestamp}_translated.html"
-                html_path = os.path.join(HTML_DIR, html_filename)
-                with open(html_path, "w", encoding="utf-8") as f:
-                    f.write(html_content)
-                
-                # 번역된 HTML 미리보기
-                st.subheader("번역된 HTML 미리보기")
-                st.components.v1.html(html_content, height=400, scrolling=True)
-                
-                # PDF 변환 버튼
-                if st.button("새 파일 PDF로 변환하기"):
-                    with st.spinner("PDF 변환 중입니다..."):
-                        # PDF 파일 경로 설정
-                        output_pdf = os.path.join(HTML_DIR, f"{os.path.splitext(html_filename)[0]}.pdf")
-                        
-                        # HTML을 PDF로 변환
-                        convert_html_to_pdf_with_math_images(html_content, output_pdf, base_dir=output_img_dir)
-                        
-                        # PDF 파일 다운로드 버튼
-                        with open(output_pdf, "rb") as f:
-                            pdf_bytes = f.read()
-                        st.download_button(
-                            "번역된 PDF 다운로드",
-                            pdf_bytes,
-                            file_name=f"{os.path.splitext(html_filename)[0]}.pdf",
-                            mime="application/pdf"
-                        )
+# 실행 중인 작업이 있으면 주기적으로 화면 갱신
+if job_queue.active_count():
+    time.sleep(2)
+    st.rerun()
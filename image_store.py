@@ -0,0 +1,151 @@
+# image_store.py
+# OCR 결과 이미지를 내용(sha256) 기준으로 한 번만 저장하는 전역 이미지 저장소
+# magic_pdf의 이미지 파일명은 잘라낸 위치(PDF md5, 페이지, bbox)의 해시라서 같은 그림도 실행/개정판마다 이름이 다름
+# 저장소는 이미지 바이트의 해시로 저장하고, 문서의 images 폴더에는 저장소 파일의 하드링크만 둠
+# (하드링크를 만들 수 없는 파일시스템이면 복사)
+#
+# 저장 구조: <root>/<해시 앞 2자리>/<해시><확장자>
+#
+# 사용 예:
+#   store = get_default_store()
+#   name = store.put(jpg_bytes, ".jpg")          # "3fa1...c2.jpg"
+#   store.link(name, "outputs/doc/images")       # outputs/doc/images/3fa1...c2.jpg
+#
+# 기존 출력 폴더(절대 경로 마크다운)를 저장소로 옮기려면:
+#   python image_store.py outputs/*/
+
+import os
+import re
+import sys
+import shutil
+import hashlib
+import argparse
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STORE_DIR = os.path.join(BASE_DIR, "cache", "images")
+
+IMAGE_REF_PATTERN = re.compile(r"(!\[[^\]]*\]\()([^)\s]+)(\))")
+
+
+# 파일 하드링크 함수 (이미 있으면 그대로 두고, 하드링크가 안 되면 복사)
+def link_file(src, dst):
+    if os.path.exists(dst):
+        return dst
+    tmp_path = f"{dst}.{os.getpid()}.tmp"
+    try:
+        os.link(src, tmp_path)
+    except OSError:
+        shutil.copy2(src, tmp_path)
+    os.replace(tmp_path, dst)
+    return dst
+
+
+class ImageStore:
+    """이미지 바이트의 sha256으로 파일을 한 번만 저장하는 저장소"""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, name):
+        return os.path.join(self.root, name[:2], name)
+
+    def put(self, data, ext=".jpg"):
+        """이미지를 저장하고 저장소 이름(<해시><확장자>) 반환 (같은 내용은 다시 쓰지 않음)"""
+        name = hashlib.sha256(data).hexdigest() + ext.lower()
+        path = self.path(name)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return name
+
+    def put_file(self, src):
+        with open(src, "rb") as f:
+            return self.put(f.read(), os.path.splitext(src)[1] or ".jpg")
+
+    def link(self, name, target_dir):
+        """저장소 이미지를 target_dir/<이름>으로 하드링크하고 경로 반환"""
+        os.makedirs(target_dir, exist_ok=True)
+        return link_file(self.path(name), os.path.join(target_dir, name))
+
+    def stats(self):
+        """저장소 이미지 수와 전체 크기, 문서 폴더에서 링크된 수(자기 자신 제외)"""
+        objects, total_bytes, links = 0, 0, 0
+        for dir_path, _, file_names in os.walk(self.root):
+            for file_name in file_names:
+                if file_name.endswith(".tmp"):
+                    continue
+                st = os.stat(os.path.join(dir_path, file_name))
+                objects += 1
+                total_bytes += st.st_size
+                links += st.st_nlink - 1
+        return {"objects": objects, "bytes": total_bytes, "links": links}
+
+
+# 기본 저장소 반환 함수 (환경변수 IMAGE_STORE_DIR로 위치 변경, 빈 문자열이면 저장소를 쓰지 않음)
+def get_default_store():
+    root = os.environ.get("IMAGE_STORE_DIR", DEFAULT_STORE_DIR)
+    return ImageStore(root) if root else None
+
+
+# 기존 출력 폴더 이전 함수 (images의 파일을 저장소로 옮기고, 마크다운의 이미지 경로를 마크다운 기준 상대 경로로 변경)
+def migrate_output_dir(store, doc_dir):
+    """반환: (이전한 이미지 수, 고친 마크다운 파일 수)"""
+    image_dir = os.path.join(doc_dir, "images")
+    md_dir = os.path.join(doc_dir, "markdown")
+    if not os.path.isdir(image_dir) or not os.path.isdir(md_dir):
+        return 0, 0
+    names = {}
+    for file_name in sorted(os.listdir(image_dir)):
+        src = os.path.join(image_dir, file_name)
+        if not os.path.isfile(src) or file_name.endswith(".tmp"):
+            continue
+        name = store.put_file(src)
+        if name != file_name or os.stat(src).st_nlink == 1:
+            os.remove(src)
+        store.link(name, image_dir)
+        names[file_name] = name
+
+    image_prefix = os.path.relpath(image_dir, md_dir)
+    changed = 0
+    for md_name in sorted(os.listdir(md_dir)):
+        if not md_name.endswith(".md"):
+            continue
+        md_path = os.path.join(md_dir, md_name)
+        with open(md_path, "r", encoding="utf-8") as f:
+            markdown = f.read()
+
+        def replace(match):
+            name = names.get(os.path.basename(match.group(2)))
+            if name is None:
+                return match.group(0)
+            return f"{match.group(1)}{image_prefix}/{name}{match.group(3)}"
+
+        new_markdown = IMAGE_REF_PATTERN.sub(replace, markdown)
+        if new_markdown != markdown:
+            with open(md_path, "w", encoding="utf-8") as f:
+                f.write(new_markdown)
+            changed += 1
+    return len(names), changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="기존 OCR 출력 폴더의 이미지를 내용 주소 저장소로 이전")
+    parser.add_argument("doc_dirs", nargs="+", help="outputs/<문서> 폴더 (images/, markdown/ 포함)")
+    parser.add_argument("--store", default=os.environ.get("IMAGE_STORE_DIR", DEFAULT_STORE_DIR))
+    args = parser.parse_args()
+
+    store = ImageStore(args.store)
+    for doc_dir in args.doc_dirs:
+        images, changed = migrate_output_dir(store, doc_dir)
+        print(f"{doc_dir}: 이미지 {images}개, 마크다운 {changed}개 수정")
+    stats = store.stats()
+    print(f"저장소 {args.store}: 이미지 {stats['objects']}개, {stats['bytes'] / 1e6:.1f}MB, 문서 링크 {stats['links']}개")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
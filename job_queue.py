@@ -0,0 +1,222 @@
+# job_queue.py
+# OCR, 번역, PDF 변환 같은 오래 걸리는 작업을 백그라운드 작업 스레드에서 실행하는 작업 큐
+# 작업 기록은 jobs_dir/<작업 id>.json에 저장되어 Streamlit 재실행이나 프로세스 재시작 후에도 남음
+#
+# 사용 예:
+#   def run_pdf(job, params):
+#       job.update(0.5, "PDF 변환 중")
+#       job.check_cancelled()
+#       return {"pdf_path": ...}
+#   jobs = JobQueue("jobs", handlers={"pdf": run_pdf})
+#   jobs.start()
+#   job_id = jobs.submit("pdf", {"html_path": ...}, title="paper.pdf")
+
+import os
+import json
+import time
+import uuid
+import threading
+import traceback
+
+# 작업 상태
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """작업 취소 요청을 받은 핸들러가 작업을 멈출 때 발생"""
+
+
+class Job:
+    """핸들러에 넘겨주는 작업 핸들 (진행 상황 보고, 취소 확인)"""
+
+    def __init__(self, queue, job_id):
+        self.queue = queue
+        self.id = job_id
+
+    @property
+    def params(self):
+        return self.queue.get(self.id)["params"]
+
+    def update(self, progress=None, message=None):
+        """progress는 0~1, message는 화면에 보여줄 현재 단계"""
+        changes = {}
+        if progress is not None:
+            changes["progress"] = max(0.0, min(1.0, float(progress)))
+        if message is not None:
+            changes["message"] = message
+        self.queue._update(self.id, **changes)
+
+    def cancelled(self):
+        return self.queue.get(self.id)["cancel_requested"]
+
+    def check_cancelled(self):
+        if self.cancelled():
+            raise JobCancelled()
+
+
+class JobQueue:
+    """
+    디스크에 기록을 남기는 작업 큐
+    handlers는 {작업 종류: fn(job, params) -> 결과 dict}, 작업 스레드 num_workers개가 오래된 작업부터 실행
+    이전 프로세스에서 실행 중이던 작업은 다시 대기열에 넣음 (번역은 체크포인트에서 이어서 진행)
+    """
+
+    def __init__(self, jobs_dir, handlers, num_workers=1):
+        os.makedirs(jobs_dir, exist_ok=True)
+        self.jobs_dir = jobs_dir
+        self.handlers = dict(handlers)
+        self.num_workers = num_workers
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._threads = []
+        self._stop = False
+        self._load()
+
+    def _load(self):
+        for name in os.listdir(self.jobs_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.jobs_dir, name), "r", encoding="utf-8") as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if record["status"] == RUNNING:
+                record["status"] = QUEUED
+                record["message"] = "이전 실행이 중단되어 다시 대기 중"
+                self._save(record)
+            self._jobs[record["id"]] = record
+
+    def _save(self, record):
+        path = os.path.join(self.jobs_dir, f"{record['id']}.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def _update(self, job_id, **changes):
+        with self._lock:
+            record = self._jobs[job_id]
+            record.update(changes)
+            record["updated_at"] = time.time()
+            self._save(record)
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._stop = False
+            for i in range(self.num_workers):
+                thread = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self):
+        with self._wakeup:
+            self._stop = True
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def submit(self, kind, params, title=None):
+        """작업을 대기열에 넣고 작업 id 반환"""
+        if kind not in self.handlers:
+            raise ValueError(f"알 수 없는 작업 종류입니다: {kind}")
+        now = time.time()
+        record = {
+            "id": f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}",
+            "kind": kind,
+            "title": title or kind,
+            "params": params,
+            "status": QUEUED,
+            "progress": 0.0,
+            "message": "대기 중",
+            "result": None,
+            "error": None,
+            "cancel_requested": False,
+            "created_at": now,
+            "started_at": None,
+            "finished_at": None,
+            "updated_at": now,
+        }
+        with self._wakeup:
+            self._jobs[record["id"]] = record
+            self._save(record)
+            self._wakeup.notify()
+        return record["id"]
+
+    def get(self, job_id):
+        with self._lock:
+            return dict(self._jobs[job_id])
+
+    def list_jobs(self, limit=None):
+        """최근 작업부터 반환"""
+        with self._lock:
+            records = sorted(self._jobs.values(), key=lambda r: r["created_at"], reverse=True)
+            return [dict(r) for r in records[:limit]]
+
+    def active_count(self):
+        with self._lock:
+            return sum(1 for r in self._jobs.values() if r["status"] in (QUEUED, RUNNING))
+
+    def cancel(self, job_id):
+        """대기 중인 작업은 바로 취소, 실행 중인 작업은 핸들러가 다음 확인 지점에서 멈춤"""
+        with self._lock:
+            record = self._jobs[job_id]
+            if record["status"] in FINISHED_STATES:
+                return
+            record["cancel_requested"] = True
+            if record["status"] == QUEUED:
+                record["status"] = CANCELLED
+                record["message"] = "취소됨"
+                record["finished_at"] = time.time()
+            else:
+                record["message"] = "취소 요청됨"
+            self._save(record)
+
+    def remove(self, job_id):
+        """끝난 작업 기록 삭제 (결과 파일은 그대로 둠)"""
+        with self._lock:
+            if self._jobs[job_id]["status"] not in FINISHED_STATES:
+                raise ValueError("끝나지 않은 작업은 삭제할 수 없습니다")
+            del self._jobs[job_id]
+            os.remove(os.path.join(self.jobs_dir, f"{job_id}.json"))
+
+    def _next_job(self):
+        queued = [r for r in self._jobs.values() if r["status"] == QUEUED]
+        if not queued:
+            return None
+        record = min(queued, key=lambda r: r["created_at"])
+        record.update(status=RUNNING, started_at=time.time(), message="실행 중", updated_at=time.time())
+        self._save(record)
+        return record
+
+    def _run(self):
+        while True:
+            with self._wakeup:
+                record = self._next_job()
+                while record is None and not self._stop:
+                    self._wakeup.wait(timeout=1.0)
+                    record = self._next_job()
+                if self._stop:
+                    if record is not None:
+                        record["status"] = QUEUED
+                        self._save(record)
+                    return
+            job = Job(self, record["id"])
+            try:
+                result = self.handlers[record["kind"]](job, record["params"])
+            except JobCancelled:
+                self._update(record["id"], status=CANCELLED, message="취소됨", finished_at=time.time())
+            except Exception as e:
+                traceback.print_exc()
+                self._update(record["id"], status=FAILED, error=f"{type(e).__name__}: {e}", message="실패", finished_at=time.time())
+            else:
+                self._update(record["id"], status=DONE, result=result, progress=1.0, message="완료", finished_at=time.time())
@@ -0,0 +1,42 @@
+# lazy_module.py
+# 무거운 모듈(torch, transformers, magic_pdf, weasyprint 등을 끌어오는 모듈)을
+# 처음 속성에 접근할 때 import하는 얇은 파사드
+#
+# 사용 예:
+#   translator = LazyModule("md_translate")
+#   translator.md_translate_to_html_stream(...)   # 여기서 처음 import
+
+import time
+import importlib
+import threading
+
+
+class LazyModule:
+    """첫 속성 접근 시 모듈을 import하고 이후에는 그 모듈의 속성을 그대로 돌려줌"""
+
+    def __init__(self, module_name):
+        self._module_name = module_name
+        self._module = None
+        self._lock = threading.Lock()
+        self.import_seconds = None
+
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                start = time.perf_counter()
+                self._module = importlib.import_module(self._module_name)
+                self.import_seconds = time.perf_counter() - start
+                print(f"{self._module_name} 로드: {self.import_seconds:.2f}s")
+        return self._module
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, name):
+        # _module 등 인스턴스 속성은 여기까지 오지 않으므로 모듈 속성만 처리
+        return getattr(self._module or self._load(), name)
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<LazyModule {self._module_name!r} ({state})>"
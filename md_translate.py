@@ -1,25 +1,131 @@
 import os
+import re
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
 from tqdm import tqdm
 import torch
-from transformers import MBartForConditionalGeneration, MBart50Tokenizer
 
 from markdown_it import MarkdownIt
+from markdown_it.token import Token
 from mdit_py_plugins.front_matter import front_matter_plugin
 from mdit_py_plugins.footnote import footnote_plugin
 
+from translation_checkpoint import TranslationCheckpoint
+from batch_budget import BatchBudget, is_out_of_memory
+from decoding_policy import get_decoding_policy
+
 # 환경변수 세팅 함수 (옵션)
 def setup_env(env_path=None):
     if env_path:
         from dotenv import load_dotenv
         load_dotenv(env_path)
 
+# int8/onnx 변환 결과를 저장하는 기본 디렉토리
+DEFAULT_MODEL_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "paper_translator")
+
 # 모델 및 토크나이저 로드 함수
-def load_mbart_model(model_name, device='cuda'):
-    tokenizer = MBart50Tokenizer.from_pretrained(model_name, src_lang="en_XX", tgt_lang="ko_KR")
-    model = MBartForConditionalGeneration.from_pretrained(model_name, device_map="auto")
-    model = model.to(device)
+def load_mbart_model(model_name, device='cuda', backend="torch", cache_dir=None, tokenizer_name=None, draft_model_name=None):
+    """
+    backend: "torch"(PyTorch fp32), "int8"(CPU 동적 int8 양자화), "onnx"(ONNX Runtime, KV 캐시 사용)
+    int8/onnx 변환 결과는 cache_dir(기본 ~/.cache/paper_translator)에 저장해 다음 로드부터 재사용
+    tokenizer_name: 토크나이저를 저장하지 않은 파인튜닝 체크포인트(trainer.save_model)용 토크나이저 경로
+    draft_model_name: assisted decoding용 작은 초안 모델 (번역 모델과 같은 토크나이저/어휘를 써야 함, torch/int8만 지원)
+    """
+    # transformers는 import 비용이 커서 모델을 실제로 로드할 때 import
+    from transformers import MBartForConditionalGeneration, MBart50TokenizerFast
+
+    # Rust 기반 fast 토크나이저 (tokenizer.json이 없으면 sentencepiece 모델에서 변환)
+    tokenizer = MBart50TokenizerFast.from_pretrained(tokenizer_name or model_name, src_lang="en_XX", tgt_lang="ko_KR")
+    if draft_model_name and backend not in ("torch", "int8"):
+        raise ValueError(f"초안 모델은 torch/int8 backend에서만 사용할 수 있습니다 (backend='{backend}')")
+    if backend == "torch":
+        # safetensors 가중치를 mmap으로 읽어 CPU에 전체 사본을 만들지 않고 바로 device에 올림
+        model = MBartForConditionalGeneration.from_pretrained(model_name, device_map={"": device})
+        model.eval()
+        if draft_model_name:
+            draft_model = MBartForConditionalGeneration.from_pretrained(draft_model_name, device_map={"": device})
+            set_draft_model(model, draft_model.eval())
+        set_model_backend(model, backend)
+        return model, tokenizer
+
+    if device != "cpu":
+        raise ValueError(f"backend '{backend}'는 CPU 전용입니다 (device='{device}')")
+    cache_dir = cache_dir or DEFAULT_MODEL_CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    if backend == "int8":
+        model = load_quantized_mbart(model_name, cache_dir)
+        if draft_model_name:
+            set_draft_model(model, load_quantized_mbart(draft_model_name, cache_dir))
+    elif backend == "onnx":
+        model = load_onnx_mbart(model_name, cache_dir)
+    else:
+        raise ValueError(f"지원하지 않는 backend입니다: {backend}")
+    set_model_backend(model, backend)
     return model, tokenizer
 
+# 번역 모델 → assisted decoding 초안 모델 (번역 모델이 해제되면 같이 해제)
+# 초안 모델을 번역 모델의 속성으로 두면 하위 모듈로 등록되어 state_dict에 섞이므로 따로 보관
+_DRAFT_MODELS = weakref.WeakKeyDictionary()
+
+def set_draft_model(model, draft_model):
+    _DRAFT_MODELS[model] = draft_model
+
+def get_draft_model(model):
+    try:
+        return _DRAFT_MODELS.get(model)
+    except TypeError:
+        # weakref를 지원하지 않는 모델 객체
+        return None
+
+# 번역 모델 → 로드한 backend ("torch", "int8", "onnx")
+# int8 양자화 모델은 fp32 모델의 name_or_path를 그대로 가지므로 번역 메모리/배치 예산 키를 나누는 데 사용
+_MODEL_BACKENDS = weakref.WeakKeyDictionary()
+
+def set_model_backend(model, backend):
+    try:
+        _MODEL_BACKENDS[model] = backend
+    except TypeError:
+        pass
+
+def get_model_backend(model):
+    try:
+        return _MODEL_BACKENDS.get(model)
+    except TypeError:
+        return None
+
+# 캐시 파일명에 쓸 수 있도록 모델 이름 변환
+def get_cache_name(model_name):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "--", model_name.strip("/"))
+
+# 동적 int8 양자화 모델 로드 함수 (Linear 레이어만 양자화, 변환 결과는 디스크에 캐시)
+def load_quantized_mbart(model_name, cache_dir):
+    from transformers import MBartForConditionalGeneration
+
+    cache_path = os.path.join(cache_dir, f"{get_cache_name(model_name)}-int8.pt")
+    if os.path.exists(cache_path):
+        model = torch.load(cache_path, map_location="cpu", weights_only=False)
+    else:
+        model = MBartForConditionalGeneration.from_pretrained(model_name)
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        torch.save(model, cache_path)
+    model.eval()
+    return model
+
+# ONNX Runtime encoder/decoder 모델 로드 함수 (optimum 필요, 최초 1회 export 후 캐시)
+def load_onnx_mbart(model_name, cache_dir):
+    try:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    except ImportError as e:
+        raise ImportError("onnx backend를 사용하려면 optimum[onnxruntime]을 설치하세요") from e
+    onnx_dir = os.path.join(cache_dir, f"{get_cache_name(model_name)}-onnx")
+    if os.path.exists(os.path.join(onnx_dir, "config.json")):
+        model = ORTModelForSeq2SeqLM.from_pretrained(onnx_dir, use_cache=True)
+    else:
+        model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True, use_cache=True)
+        model.save_pretrained(onnx_dir)
+    return model
+
 # 마크다운 파서 생성 함수
 def get_md_parser():
     md = (
@@ -30,49 +136,744 @@ def get_md_parser():
     )
     return md
 
-# 배치 번역 함수
-def translate_batch(text_list, model, tokenizer, device="cuda", max_length=512):
-    if not text_list:
-        return []
-    inputs = tokenizer(text_list, return_tensors="pt", padding=True, truncation=True, max_length=max_length).to(device)
+# 배치 토크나이즈 함수 (CPU 텐서 반환)
+def encode_batch(text_list, tokenizer, max_length=512):
+    return tokenizer(text_list, return_tensors="pt", padding=True, truncation=True, max_length=max_length)
+
+# 배치 generate 함수 (반환: 생성 토큰, 사용한 generate 인자)
+def generate_batch(inputs, model, forced_bos_token_id, policy):
+    generate_kwargs = policy.generate_kwargs(inputs["input_ids"].shape[1])
+    draft_model = get_draft_model(model) if policy.assisted else None
+    if draft_model is not None:
+        return generate_assisted(inputs, model, draft_model, forced_bos_token_id, generate_kwargs), generate_kwargs
     with torch.no_grad():
         generated_tokens = model.generate(
             **inputs,
-            forced_bos_token_id=tokenizer.lang_code_to_id["ko_KR"],
-            max_length=max_length,
-            num_beams=5,
+            forced_bos_token_id=forced_bos_token_id,
+            **generate_kwargs,
         )
+    return generated_tokens, generate_kwargs
+
+# assisted decoding 함수 (초안 모델이 토큰을 제안하고 번역 모델이 한 번에 검증, greedy 결과와 동일)
+def generate_assisted(inputs, model, draft_model, forced_bos_token_id, generate_kwargs):
+    """
+    transformers의 assisted generation은 배치 크기 1만 지원하므로 문장별로 generate 후
+    pad 토큰으로 길이를 맞춰 배치 결과와 같은 모양으로 반환
+    """
+    pad_token_id = model.config.pad_token_id
+    outputs = []
+    with torch.no_grad():
+        for input_ids, attention_mask in zip(inputs["input_ids"], inputs["attention_mask"]):
+            # 문장별로 생성하므로 배치 패딩은 잘라냄
+            length = int(attention_mask.sum())
+            outputs.append(model.generate(
+                input_ids=input_ids[:length].unsqueeze(0),
+                attention_mask=attention_mask[:length].unsqueeze(0),
+                forced_bos_token_id=forced_bos_token_id,
+                assistant_model=draft_model,
+                **generate_kwargs,
+            )[0])
+    width = max(len(o) for o in outputs)
+    generated_tokens = outputs[0].new_full((len(outputs), width), pad_token_id)
+    for i, output in enumerate(outputs):
+        generated_tokens[i, :len(output)] = output
+    return generated_tokens
+
+# 배치 성능 지표 기록 함수
+def record_batch_metrics(metrics, inputs, generated_tokens, tokenizer, generate_kwargs, tokenize_seconds, generate_seconds, decode_seconds):
+    source_tokens = int(inputs["attention_mask"].sum())
+    padded_tokens = int(inputs["attention_mask"].numel())
+    metrics.record_batch(
+        batch_size=int(inputs["input_ids"].shape[0]),
+        source_tokens=source_tokens,
+        padded_tokens=padded_tokens,
+        target_tokens=int((generated_tokens != tokenizer.pad_token_id).sum()),
+        tokenize_seconds=tokenize_seconds,
+        generate_seconds=generate_seconds,
+        decode_seconds=decode_seconds,
+        padding_ratio=1.0 - source_tokens / padded_tokens,
+        num_beams=generate_kwargs["num_beams"],
+    )
+
+# 배치 예산(BatchBudget) 키 생성 함수
+def get_budget_key(model, device, policy):
+    return BatchBudget.make_key(get_model_name(model), str(device), policy.name)
+
+# 메모리 부족(OOM) 후 캐시된 GPU 메모리를 반환하는 함수
+def release_device_memory(device):
+    if str(device).startswith("cuda"):
+        torch.cuda.empty_cache()
+
+# 배치 번역 함수
+def translate_batch(text_list, model, tokenizer, device="cuda", max_length=512, policy=None, metrics=None, budget=None):
+    """
+    metrics(TranslationMetrics)가 주어지면 토크나이즈/generate/디코드 시간과 토큰 수를 배치 단위로 기록
+    메모리 부족(OOM)이 나면 배치를 반으로 나눠 다시 번역하고 (한 문장도 안 되면 예외),
+    budget(BatchBudget)이 주어지면 성공/실패한 배치 크기를 기록해 배치당 최대 토큰 수를 학습
+    """
+    if not text_list:
+        return []
+    policy = get_decoding_policy(policy, max_length=max_length)
+    tokenize_start = time.perf_counter()
+    inputs = encode_batch(text_list, tokenizer, max_length=max_length)
+    padded_tokens = int(inputs["attention_mask"].numel())
+    generate_start = time.perf_counter()
+    try:
+        inputs = inputs.to(device)
+        generated_tokens, generate_kwargs = generate_batch(inputs, model, tokenizer.convert_tokens_to_ids("ko_KR"), policy)
+    except (RuntimeError, MemoryError) as e:
+        if not is_out_of_memory(e) or len(text_list) == 1:
+            raise
+        generated_tokens = None
+    if generated_tokens is None:
+        # except 블록 밖에서 다시 시도해야 예외가 잡고 있는 텐서가 해제됨
+        del inputs
+        return translate_after_oom(text_list, padded_tokens, model, tokenizer, device, max_length, policy, metrics, budget)
+    if budget is not None:
+        budget.record_success(get_budget_key(model, device, policy), padded_tokens)
+    if metrics is not None and str(device).startswith("cuda"):
+        torch.cuda.synchronize()
+    decode_start = time.perf_counter()
     translated = tokenizer.batch_decode(generated_tokens, skip_special_tokens=True)
+    if metrics is not None:
+        record_batch_metrics(
+            metrics, inputs, generated_tokens, tokenizer, generate_kwargs,
+            generate_start - tokenize_start, decode_start - generate_start, time.perf_counter() - decode_start,
+        )
     return translated
 
-# 토큰의 text만 번역해서 교체하는 함수
-def replace_text_tokens(tokens, model, tokenizer, device="cuda", batch_size=10):
-    text_tokens = []
+# 메모리 부족으로 실패한 배치를 반으로 나눠 다시 번역하는 함수
+def translate_after_oom(text_list, padded_tokens, model, tokenizer, device, max_length, policy, metrics, budget):
+    if budget is not None:
+        budget.record_oom(get_budget_key(model, device, policy), padded_tokens)
+    release_device_memory(device)
+    half = len(text_list) // 2
+    print(f"메모리 부족: {len(text_list)}개 배치({padded_tokens} 토큰)를 {half}개/{len(text_list) - half}개로 나눠 다시 번역합니다")
+    kwargs = {"device": device, "max_length": max_length, "policy": policy, "metrics": metrics, "budget": budget}
+    return translate_batch(text_list[:half], model, tokenizer, **kwargs) + translate_batch(text_list[half:], model, tokenizer, **kwargs)
+
+# 여러 배치를 순서대로 번역해 배치별 결과를 yield하는 함수
+def iter_translate_batches(batch_list, model, tokenizer, device="cuda", max_length=512, policy=None, metrics=None, pipelined=True, budget=None, max_batch_tokens=None):
+    """
+    pipelined=True이면 batch N을 generate하는 동안 작업 스레드에서 batch N+1 토크나이즈와 batch N-1 디코드를 수행
+    토크나이저는 스레드 안전하지 않으므로 작업 스레드 하나에서만 사용하고, 결과는 translate_batch를 순서대로 부른 것과 같음
+    max_batch_tokens(배치를 묶을 때 쓴 예산)가 주어지면 OOM으로 budget이 그보다 줄어든 배치까지만 yield하고 멈춤
+    (남은 배치는 호출자가 줄어든 예산으로 다시 묶음)
+    """
+    policy = get_decoding_policy(policy, max_length=max_length)
+
+    def budget_lowered():
+        if budget is None or max_batch_tokens is None:
+            return False
+        return budget.get(get_budget_key(model, device, policy), max_batch_tokens) < max_batch_tokens
+
+    if not pipelined or len(batch_list) < 2:
+        for text_list in batch_list:
+            yield translate_batch(text_list, model, tokenizer, device=device, max_length=max_length, policy=policy, metrics=metrics, budget=budget)
+            if budget_lowered():
+                return
+        return
+
+    forced_bos_token_id = tokenizer.convert_tokens_to_ids("ko_KR")
+
+    def encode(text_list):
+        start = time.perf_counter()
+        inputs = encode_batch(text_list, tokenizer, max_length=max_length)
+        return inputs, time.perf_counter() - start
+
+    def decode(generated_tokens):
+        start = time.perf_counter()
+        translated = tokenizer.batch_decode(generated_tokens, skip_special_tokens=True)
+        return translated, time.perf_counter() - start
+
+    def finish(i):
+        translated, decode_seconds = decode_futures[i].result()
+        if metrics is not None and i in batch_info:
+            inputs, generated_tokens, generate_kwargs, tokenize_seconds, generate_seconds = batch_info.pop(i)
+            record_batch_metrics(metrics, inputs, generated_tokens, tokenizer, generate_kwargs, tokenize_seconds, generate_seconds, decode_seconds)
+        return translated
+
+    decode_futures = []
+    batch_info = {}
+    with ThreadPoolExecutor(max_workers=1) as worker:
+        next_encode = worker.submit(encode, batch_list[0])
+        for i in range(len(batch_list)):
+            inputs, tokenize_seconds = next_encode.result()
+            if i + 1 < len(batch_list):
+                next_encode = worker.submit(encode, batch_list[i + 1])
+            padded_tokens = int(inputs["attention_mask"].numel())
+            generate_start = time.perf_counter()
+            try:
+                generated_tokens, generate_kwargs = generate_batch(inputs.to(device), model, forced_bos_token_id, policy)
+                # GPU 결과는 메인 스레드에서 CPU로 옮긴 뒤 작업 스레드에서 디코드
+                generated_tokens = generated_tokens.cpu()
+            except (RuntimeError, MemoryError) as e:
+                if not is_out_of_memory(e) or len(batch_list[i]) == 1:
+                    raise
+                generated_tokens = None
+            if generated_tokens is None:
+                # 나눠서 바로 번역 (지표는 translate_batch에서 기록)
+                # 메인 스레드에서 토크나이저를 쓰므로 작업 스레드에 넣어 둔 토크나이즈/디코드가 끝날 때까지 기다림
+                worker.submit(lambda: None).result()
+                decode_futures.append(Future())
+                decode_futures[i].set_result((
+                    translate_after_oom(batch_list[i], padded_tokens, model, tokenizer, device, max_length, policy, metrics, budget), 0.0,
+                ))
+            else:
+                generate_seconds = time.perf_counter() - generate_start
+                if budget is not None:
+                    budget.record_success(get_budget_key(model, device, policy), padded_tokens)
+                decode_futures.append(worker.submit(decode, generated_tokens))
+                if metrics is not None:
+                    batch_info[i] = (inputs, generated_tokens, generate_kwargs, tokenize_seconds, generate_seconds)
+            if i > 0:
+                yield finish(i - 1)
+            if budget_lowered():
+                yield finish(i)
+                return
+        yield finish(len(batch_list) - 1)
+
+# 텍스트별 토큰 길이 계산 함수 (특수 토큰 포함, max_length에서 잘림)
+def get_token_lengths(text_list, tokenizer, max_length=512):
+    if not text_list:
+        return []
+    encoded = tokenizer(text_list, truncation=True, max_length=max_length)
+    return [len(ids) for ids in encoded["input_ids"]]
+
+# 배치 구성의 패딩 비율 계산 함수
+def compute_padding_ratio(lengths, batches):
+    """
+    각 배치를 가장 긴 항목 길이로 패딩했을 때 전체 입력 중 패딩 토큰의 비율을 반환
+    """
+    padded = 0
+    real = 0
+    for batch in batches:
+        if not batch:
+            continue
+        batch_lengths = [lengths[i] for i in batch]
+        padded += max(batch_lengths) * len(batch_lengths)
+        real += sum(batch_lengths)
+    if padded == 0:
+        return 0.0
+    return 1.0 - real / padded
+
+# 길이 정렬 + 토큰 예산 기반 배치 스케줄링 함수
+def build_length_batches(lengths, max_batch_tokens=4096, max_batch_size=64):
+    """
+    토큰 길이순으로 정렬한 뒤, 배치마다 (가장 긴 길이 × 항목 수)가 max_batch_tokens를 넘지 않도록 묶음
+    예산보다 긴 항목은 단독 배치가 됨. 반환값은 원본 인덱스 리스트의 리스트
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches = []
+    current = []
+    for i in order:
+        # 정렬되어 있으므로 새 항목이 배치에서 가장 긴 항목
+        if current and (lengths[i] * (len(current) + 1) > max_batch_tokens or len(current) >= max_batch_size):
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
+
+# 문장 분리 시 끊으면 안 되는 약어 (소문자로 비교)
+ABBREVIATIONS = {
+    "e.g", "i.e", "et al", "al", "etc", "vs", "cf", "resp", "approx", "viz",
+    "fig", "figs", "eq", "eqs", "sec", "secs", "tab", "ref", "refs", "ch", "vol", "no", "pp",
+    "dr", "mr", "mrs", "ms", "prof", "jr", "sr", "st", "inc", "ltd", "co", "corp",
+}
+
+# LaTeX 수식 구간 패턴 ($$...$$, $...$, \(...\), \[...\])
+LATEX_SPAN_RE = re.compile(r"\$\$.+?\$\$|\$[^$]+?\$|\\\(.+?\\\)|\\\[.+?\\\]", re.DOTALL)
+# 문장 경계 후보: 종결 부호(+닫는 따옴표/괄호) 뒤의 공백
+SENTENCE_END_RE = re.compile(r"[.!?][\"”’')\]]*(\s+)")
+
+# 텍스트를 문장 단위로 나누는 함수 (LaTeX 구간과 약어는 끊지 않음)
+def split_sentences(text):
+    """
+    반환값은 (문장 리스트, 문장 사이 공백 리스트)이며 ''.join으로 원문을 복원할 수 있음
+    """
+    protected = [m.span() for m in LATEX_SPAN_RE.finditer(text)]
+    sentences = []
+    separators = []
+    start = 0
+    for m in SENTENCE_END_RE.finditer(text):
+        end = m.start(1)
+        if any(a < end <= b for a, b in protected):
+            continue
+        next_char = text[m.end():m.end() + 1]
+        if not next_char or next_char.islower():
+            continue
+        words = text[start:m.start()].split()
+        last_word = words[-1].lstrip("([{\"“").lower() if words else ""
+        # 약어나 한 글자 이니셜(A. B. Smith) 뒤에서는 끊지 않음
+        if text[m.start()] == "." and (last_word in ABBREVIATIONS or (len(last_word) == 1 and last_word.isalpha())):
+            continue
+        sentences.append(text[start:end])
+        separators.append(m.group(1))
+        start = m.end()
+    sentences.append(text[start:])
+    return sentences, separators
+
+# 긴 텍스트를 모델 입력 크기에 맞는 문장 묶음으로 나누는 함수
+def segment_text(text, tokenizer, max_segment_tokens=160, max_length=512):
+    """
+    토큰 길이가 max_segment_tokens 이하면 그대로 두고, 넘으면 문장 단위로 나눈 뒤
+    인접 문장을 max_segment_tokens 안에서 다시 묶음. 반환값은 (단위 리스트, 단위 사이 구분자 리스트)
+    """
+    if get_token_lengths([text], tokenizer, max_length=max_length * 4)[0] <= max_segment_tokens:
+        return [text], []
+    sentences, separators = split_sentences(text)
+    lengths = get_token_lengths(sentences, tokenizer, max_length=max_length * 4)
+
+    # 한 문장이 너무 길면 단어 경계에서 균등하게 자름
+    pieces, piece_lengths, piece_seps = [], [], []
+    for i, (sentence, length) in enumerate(zip(sentences, lengths)):
+        if length > max_segment_tokens:
+            words = sentence.split(" ")
+            n_chunks = -(-length // max_segment_tokens)
+            step = -(-len(words) // n_chunks)
+            chunks = [" ".join(words[j:j+step]) for j in range(0, len(words), step)]
+            pieces.extend(chunks)
+            piece_lengths.extend([length // len(chunks)] * len(chunks))
+            piece_seps.extend([" "] * (len(chunks) - 1))
+        else:
+            pieces.append(sentence)
+            piece_lengths.append(length)
+        if i < len(separators):
+            piece_seps.append(separators[i])
+
+    # 인접 조각을 예산 안에서 묶기 (특수 토큰 2개는 한 번만 셈)
+    units, unit_seps = [pieces[0]], []
+    current_length = piece_lengths[0]
+    for piece, length, sep in zip(pieces[1:], piece_lengths[1:], piece_seps):
+        if current_length + length - 2 <= max_segment_tokens:
+            units[-1] = units[-1] + sep + piece
+            current_length += length - 2
+        else:
+            units.append(piece)
+            unit_seps.append(sep)
+            current_length = length
+    return units, unit_seps
+
+# 번역하지 않고 그대로 보존할 구간 (LaTeX 수식, URL, 인용 번호, 소수/백분율/긴 숫자)
+PROTECTED_SPAN_RE = re.compile(
+    r"\$\$.+?\$\$"
+    r"|\$[^$\n]+?\$"
+    r"|\\\(.+?\\\)|\\\[.+?\\\]"
+    r"|(?:https?://|www\.)[^\s<>()\[\]]*[^\s<>()\[\].,;:!?'\"]"
+    r"|\[\d+(?:\s*[-–,]\s*\d+)*\]"
+    r"|(?<![\w.])\d+(?:[.,]\d+)+%?(?![\w])|(?<![\w.])\d+%|(?<![\w.])\d{4,}(?![\w])",
+    re.DOTALL,
+)
+# 보존 구간 자리표시자 (모델 출력의 공백 변형도 허용)
+PLACEHOLDER_RE = re.compile(r"\[\s*#\s*(\d+)\s*\]")
 
-    def collect_text_tokens(tokens):
-        for token in tokens:
-            if token.type == "text":
-                text_tokens.append(token)
-            if hasattr(token, 'children') and token.children:
-                collect_text_tokens(token.children)
-    collect_text_tokens(tokens)
+# 보존 구간을 자리표시자([#0], [#1], ...)로 바꾸는 함수 (반환: 마스킹된 텍스트, 원래 구간 리스트)
+def mask_protected_spans(text):
+    spans = []
 
-    all_texts = [t.content for t in text_tokens]
+    def to_placeholder(m):
+        spans.append(m.group(0))
+        return f"[#{len(spans) - 1}]"
+    return PROTECTED_SPAN_RE.sub(to_placeholder, text), spans
+
+# 번역 결과의 자리표시자를 원래 구간으로 되돌리는 함수 (모델이 빠뜨린 구간은 끝에 덧붙임)
+def unmask_protected_spans(text, spans):
+    if not spans:
+        return text
+    used = set()
+
+    def to_span(m):
+        i = int(m.group(1))
+        if i >= len(spans):
+            return m.group(0)
+        used.add(i)
+        return spans[i]
+    restored = PLACEHOLDER_RE.sub(to_span, text)
+    missing = [span for i, span in enumerate(spans) if i not in used]
+    if missing:
+        restored = restored.rstrip() + " " + " ".join(missing)
+    return restored
+
+# 마스킹 후에도 번역할 영어 단어가 남아 있는지 확인하는 함수
+def is_translatable(masked_text):
+    return re.search(r"[A-Za-z]{2,}", PLACEHOLDER_RE.sub(" ", masked_text)) is not None
+
+# 마스킹으로 줄어든 모델 입력량 출력 함수 (tokenizer가 없으면 글자 수 기준)
+def report_masking_savings(all_texts, masked_texts, skipped, tokenizer=None):
+    if tokenizer is not None:
+        measure, unit = (lambda texts: sum(get_token_lengths(texts, tokenizer, max_length=10**6))), "토큰"
+    else:
+        measure, unit = (lambda texts: sum(len(t) for t in texts)), "글자"
+    before = measure(all_texts)
+    after = measure([m for i, m in enumerate(masked_texts) if i not in skipped])
+    saved = before - after
+    print(
+        f"보존 구간 마스킹: 모델 입력 {len(all_texts)}개 중 {len(skipped)}개 생략, "
+        f"{unit} {before} → {after} ({saved} 절약, {saved / before if before else 0:.1%})"
+    )
+    return {"texts": len(all_texts), "skipped_texts": len(skipped), "before": before, "after": after, "unit": unit}
+
+# 번역 메모리와 배치 예산 키에 쓰이는 모델 이름 반환 함수 (int8/onnx backend는 이름에 포함)
+def get_model_name(model):
+    name = getattr(model, "name_or_path", None)
+    if not name and hasattr(model, "config"):
+        name = getattr(model.config, "_name_or_path", None)
+    name = name or type(model).__name__
+    # fp32(torch) 모델은 기존 키를 그대로 쓰고, 출력과 메모리 사용량이 다른 int8/onnx는 backend를 붙여 구분
+    backend = get_model_backend(model)
+    if backend not in (None, "torch"):
+        name = f"{name}@{backend}"
+    return name
+
+# 번역 단위 리스트를 길이 버킷 배치로 번역하는 함수 (입력 순서대로 결과 반환)
+def translate_units(text_list, model, tokenizer, device="cuda", batch_size=32, max_batch_tokens=4096, max_length=512, memory=None, policy=None, on_batch=None, metrics=None, pipelined=True, budget=None):
+    """
+    문서 내 중복 텍스트는 한 번만 번역하고, memory(TranslationMemory)가 주어지면 캐시에 없는 텍스트만 모델로 보냄
+    policy는 DecodingPolicy 또는 정책 이름("quality", "balanced", "fast")
+    on_batch가 주어지면 캐시 조회 후와 배치마다 새로 얻은 {원문: 번역}을 넘겨 호출
+    pipelined=True이면 토크나이즈/디코드를 generate와 겹쳐 실행 (iter_translate_batches 참고)
+    budget(BatchBudget)이 주어지면 max_batch_tokens 대신 이 모델/device에서 학습된 배치당 최대 토큰 수 사용
+    """
+    if not text_list:
+        return []
+
+    # 문서 내 중복 제거 (첫 등장 순서 유지)
+    unique_texts = list(dict.fromkeys(text_list))
+    results = {}
+
+    model_name = get_model_name(model)
+    policy = get_decoding_policy(policy, max_length=max_length)
+    settings = policy.cache_settings()
+    if memory is not None:
+        results.update(memory.lookup(unique_texts, model_name, settings))
+    pending = [t for t in unique_texts if t not in results]
+    if on_batch is not None and results:
+        on_batch(dict(results))
+    print(f"번역 대상: 전체 {len(text_list)}개, 중복 제거 {len(unique_texts)}개, 캐시 적중 {len(unique_texts) - len(pending)}개, 모델 번역 {len(pending)}개")
+
+    token_lengths = dict(zip(pending, get_token_lengths(pending, tokenizer, max_length=max_length)))
+    while pending:
+        if budget is not None:
+            max_batch_tokens = budget.get(get_budget_key(model, device, policy), max_batch_tokens)
+            print(f"배치 예산: 배치당 최대 {max_batch_tokens} 토큰")
+        lengths = [token_lengths[t] for t in pending]
+        batches = build_length_batches(lengths, max_batch_tokens=max_batch_tokens, max_batch_size=batch_size)
+
+        # 기존 방식(문서 순서, 고정 batch_size)과 패딩 비율 비교 출력
+        fixed_batches = [list(range(i, min(i + batch_size, len(lengths)))) for i in range(0, len(lengths), batch_size)]
+        print(
+            f"패딩 비율: 고정 배치 {compute_padding_ratio(lengths, fixed_batches):.1%} ({len(fixed_batches)}개 배치) → "
+            f"길이 버킷 배치 {compute_padding_ratio(lengths, batches):.1%} ({len(batches)}개 배치)"
+        )
+
+        batch_list = [[pending[i] for i in batch] for batch in batches]
+        translated_batches = iter_translate_batches(
+            batch_list, model, tokenizer, device=device, max_length=max_length, policy=policy, metrics=metrics,
+            pipelined=pipelined, budget=budget, max_batch_tokens=max_batch_tokens if budget is not None else None,
+        )
+        for batch_texts, translated_batch in tqdm(zip(batch_list, translated_batches), total=len(batch_list), desc="Translating"):
+            results.update(zip(batch_texts, translated_batch))
+            # 배치마다 저장해 두면 중간에 중단되어도 다음 실행에서 재사용 가능
+            if memory is not None:
+                memory.store(list(zip(batch_texts, translated_batch)), model_name, settings)
+            if on_batch is not None:
+                on_batch(dict(zip(batch_texts, translated_batch)))
+        # 메모리 부족으로 예산이 줄면 iter_translate_batches가 멈추므로 남은 텍스트를 줄어든 예산으로 다시 묶음
+        pending = [t for t in pending if t not in results]
+
+    return [results[t] for t in text_list]
+
+# 텍스트 리스트를 번역 단위로 나누는 함수 (반환: 단위 리스트, 텍스트별 (시작 위치, 단위 수, 구분자) 리스트)
+def segment_texts(text_list, tokenizer, max_segment_tokens=160, max_length=512):
+    units = []
+    plans = []
+    for text in text_list:
+        text_units, separators = segment_text(text, tokenizer, max_segment_tokens=max_segment_tokens, max_length=max_length)
+        plans.append((len(units), len(text_units), separators))
+        units.extend(text_units)
+    return units, plans
+
+# 번역된 단위를 원래 텍스트 단위로 다시 이어 붙이는 함수
+def stitch_segments(translated_units, plans):
     translated_texts = []
-    for i in tqdm(range(0, len(all_texts), batch_size), desc="Translating"):
-        batch = all_texts[i:i+batch_size]
-        translated_batch = translate_batch(batch, model, tokenizer, device=device)
-        translated_texts.extend(translated_batch)
+    for start, count, separators in plans:
+        pieces = translated_units[start:start + count]
+        stitched = pieces[0]
+        for sep, piece in zip(separators, pieces[1:]):
+            stitched += sep + piece
+        translated_texts.append(stitched)
+    return translated_texts
+
+# 텍스트 리스트를 번역하는 함수 (긴 텍스트는 문장 단위로 나눠 번역한 뒤 다시 이어 붙임)
+def translate_texts(text_list, model, tokenizer, device="cuda", batch_size=32, max_batch_tokens=4096, max_length=512, memory=None, max_segment_tokens=160, policy=None, on_progress=None, metrics=None, budget=None):
+    """
+    on_progress가 주어지면 배치마다 번역이 끝난 텍스트를 {text_list 인덱스: 번역}으로 넘겨 호출
+    """
+    if not text_list:
+        return []
+    units, plans = segment_texts(text_list, tokenizer, max_segment_tokens=max_segment_tokens, max_length=max_length)
+    if len(units) > len(text_list):
+        print(f"문장 분할: 텍스트 {len(text_list)}개 → 번역 단위 {len(units)}개")
+
+    on_batch = None
+    if on_progress is not None:
+        available = {}
+        waiting = set(range(len(plans)))
+
+        # 모든 단위가 번역된 텍스트만 이어 붙여 전달
+        def report_finished(new_results):
+            available.update(new_results)
+            finished = {}
+            for pos in sorted(waiting):
+                start, count, separators = plans[pos]
+                pieces = units[start:start + count]
+                if all(u in available for u in pieces):
+                    finished[pos] = stitch_segments([available[u] for u in pieces], [(0, count, separators)])[0]
+            waiting.difference_update(finished)
+            if finished:
+                on_progress(finished)
+        on_batch = report_finished
 
-    for token, new_text in zip(text_tokens, translated_texts):
-        token.content = new_text
+    translated_units = translate_units(
+        units, model, tokenizer, device=device, batch_size=batch_size,
+        max_batch_tokens=max_batch_tokens, max_length=max_length, memory=memory, policy=policy,
+        on_batch=on_batch, metrics=metrics, budget=budget,
+    )
+    return stitch_segments(translated_units, plans)
+
+# 인라인 마크업 자리표시자 태그 패턴 (<g0>, </g0>, <x1/>; 모델이 넣은 공백도 허용)
+INLINE_TAG_RE = re.compile(r"<\s*(/?)\s*([gx])\s*(\d+)\s*(/?)\s*>")
+
+# 문단(inline 토큰) 하나를 번역 단위로 표현하는 클래스
+class InlineUnit:
+    """
+    inline 토큰의 children을 하나의 문자열로 합쳐 번역하고 결과를 다시 children 구조로 되돌림
+    짝이 있는 마크업(굵게, 기울임, 링크 등)은 <gN>...</gN>, 단독 토큰(인라인 코드, 이미지, 줄바꿈, html 등)은 <xN/>
+    """
+
+    def __init__(self, token):
+        self.token = token
+        self.text_tokens = [c for c in token.children if c.type == "text"]
+        self.open_tokens = {}
+        self.close_tokens = {}
+        self.single_tokens = {}
+        parts = []
+        stack = []
+        for child in token.children:
+            if child.type == "text":
+                parts.append(child.content)
+            elif child.nesting == 1:
+                n = len(self.open_tokens) + len(self.single_tokens)
+                self.open_tokens[n] = child
+                stack.append(n)
+                parts.append(f"<g{n}>")
+            elif child.nesting == -1 and stack:
+                n = stack.pop()
+                self.close_tokens[n] = child
+                parts.append(f"</g{n}>")
+            else:
+                n = len(self.open_tokens) + len(self.single_tokens)
+                self.single_tokens[n] = child
+                parts.append(f"<x{n}/>")
+        self.source = "".join(parts)
+
+    def apply(self, translated):
+        """
+        번역 결과의 태그를 원래 마크업 토큰으로 되돌려 children 교체
+        태그가 빠지거나 중복되거나 짝이 맞지 않으면 아무것도 바꾸지 않고 False 반환
+        """
+        children = []
+        stack = []
+        seen = set()
+        pos = 0
+        for m in INLINE_TAG_RE.finditer(translated):
+            if m.start() > pos:
+                children.append(self._text_token(translated[pos:m.start()]))
+            closing, kind, n = m.group(1), m.group(2), int(m.group(3))
+            if kind == "x":
+                if n not in self.single_tokens or ("x", n) in seen:
+                    return False
+                seen.add(("x", n))
+                children.append(self.single_tokens[n])
+            elif closing:
+                if not stack or stack[-1] != n:
+                    return False
+                stack.pop()
+                children.append(self.close_tokens[n])
+            else:
+                if n not in self.open_tokens or ("g", n) in seen:
+                    return False
+                seen.add(("g", n))
+                stack.append(n)
+                children.append(self.open_tokens[n])
+            pos = m.end()
+        if pos < len(translated):
+            children.append(self._text_token(translated[pos:]))
+        if stack or len(seen) != len(self.open_tokens) + len(self.single_tokens):
+            return False
+        self.token.children = children
+        return True
+
+    def _text_token(self, content):
+        token = Token("text", "", 0)
+        token.content = content
+        return token
+
+# 토큰 트리에서 번역할 문단(inline 토큰)을 문서 순서대로 모으는 함수 (텍스트가 없는 inline은 제외)
+def collect_translation_units(tokens):
+    return [
+        InlineUnit(token) for token in tokens
+        if token.type == "inline" and token.children and any(c.type == "text" and c.content.strip() for c in token.children)
+    ]
+
+# 텍스트 리스트에 마스킹/체크포인트/번역/복원을 적용하는 함수 (입력 순서대로 번역 결과 반환)
+def translate_document_texts(all_texts, model, tokenizer, device="cuda", batch_size=32, max_batch_tokens=4096, memory=None, max_segment_tokens=160, policy=None, server_url=None, checkpoint=None, index_offset=0, metrics=None, budget=None):
+    # 수식/URL/인용 번호 등은 자리표시자로 바꾸고, 번역할 단어가 없는 텍스트는 모델에 보내지 않음
+    masked = [mask_protected_spans(text) for text in all_texts]
+    masked_texts = [m for m, _ in masked]
+    todo = [i for i, m in enumerate(masked_texts) if is_translatable(m)]
+    skipped = set(range(len(all_texts))) - set(todo)
+    if all_texts:
+        report_masking_savings(all_texts, masked_texts, skipped, tokenizer=tokenizer)
+
+    # 체크포인트에 이미 있는 항목은 다시 번역하지 않음
+    resumed = {}
+    record_progress = None
+    if checkpoint is not None:
+        resumed = {i: checkpoint.translated[index_offset + i] for i in todo if index_offset + i in checkpoint.translated}
+        todo = [i for i in todo if i not in resumed]
+
+        def record_checkpoint(finished):
+            checkpoint.record({index_offset + todo[pos]: unmask_protected_spans(text, masked[todo[pos]][1]) for pos, text in finished.items()})
+        record_progress = record_checkpoint
+
+    todo_texts = [masked_texts[i] for i in todo]
+    if server_url:
+        from translate_server import request_translation
+        todo_results = request_translation(todo_texts, server_url, policy=policy)
+        if record_progress is not None:
+            record_progress(dict(enumerate(todo_results)))
+    else:
+        todo_results = translate_texts(
+            todo_texts, model, tokenizer, device=device,
+            batch_size=batch_size, max_batch_tokens=max_batch_tokens, memory=memory,
+            max_segment_tokens=max_segment_tokens, policy=policy, on_progress=record_progress, metrics=metrics, budget=budget,
+        )
+
+    translated_texts = list(all_texts)
+    for i, new_text in resumed.items():
+        translated_texts[i] = new_text
+    for i, new_text in zip(todo, todo_results):
+        translated_texts[i] = unmask_protected_spans(new_text, masked[i][1])
+    return translated_texts
+
+# 토큰의 text를 문단 단위로 번역해서 교체하는 함수
+def replace_text_tokens(tokens, model, tokenizer, device="cuda", batch_size=32, max_batch_tokens=4096, memory=None, max_segment_tokens=160, policy=None, server_url=None, checkpoint=None, index_offset=0, metrics=None, budget=None):
+    """
+    inline 토큰(문단, 제목, 표 셀 등) 하나를 인라인 마크업 태그가 포함된 하나의 문자열로 번역한 뒤 children 구조로 되돌림
+    번역 결과의 태그가 깨진 문단만 예전처럼 text 토큰 단위로 다시 번역
+    batch_size는 배치당 최대 항목 수, max_batch_tokens는 배치당 (패딩 포함) 최대 입력 토큰 수
+    memory는 번역 메모리 캐시(TranslationMemory, 선택), max_segment_tokens보다 긴 텍스트는 문장 단위로 나눠 번역
+    policy는 디코딩 정책(DecodingPolicy 또는 "quality"/"balanced"/"fast", 기본은 quality)
+    server_url이 주어지면 로컬 모델 대신 번역 서버(translate_server.py)에 요청 (model, tokenizer는 None 가능)
+    checkpoint(TranslationCheckpoint)가 주어지면 이미 번역된 문단은 건너뛰고, 배치마다 진행 상황을 기록
+    index_offset은 tokens가 문서 일부일 때 체크포인트에 기록할 첫 문단의 문서 내 인덱스
+    metrics(TranslationMetrics)가 주어지면 배치별 성능 지표를 기록
+    budget(BatchBudget)이 주어지면 OOM/성공 기록으로 학습한 배치당 최대 토큰 수를 사용하고 갱신
+    """
+    options = dict(
+        device=device, batch_size=batch_size, max_batch_tokens=max_batch_tokens, memory=memory,
+        max_segment_tokens=max_segment_tokens, policy=policy, server_url=server_url, metrics=metrics, budget=budget,
+    )
+    units = collect_translation_units(tokens)
+    translated_texts = translate_document_texts(
+        [u.source for u in units], model, tokenizer, checkpoint=checkpoint, index_offset=index_offset, **options,
+    )
+    failed = [u for u, new_text in zip(units, translated_texts) if not u.apply(new_text)]
+
+    # 태그 복원에 실패한 문단은 text 토큰 단위로 번역
+    if failed:
+        fallback_tokens = [t for u in failed for t in u.text_tokens]
+        print(f"인라인 태그 복원 실패: 문단 {len(failed)}개를 text 토큰 {len(fallback_tokens)}개 단위로 다시 번역")
+        fallback_texts = translate_document_texts([t.content for t in fallback_tokens], model, tokenizer, **options)
+        for token, new_text in zip(fallback_tokens, fallback_texts):
+            token.content = new_text
+
+# 체크포인트 유효성 확인용 번역 설정 (모델 또는 서버 주소, 디코딩 정책)
+def get_checkpoint_settings(model, policy=None, server_url=None):
+    return {
+        "model": server_url if server_url else get_model_name(model),
+        "policy": get_decoding_policy(policy).cache_settings(),
+    }
 
 # 메인 파이프라인 함수 (md 경로 → html 변환까지)
-def md_translate_to_html(md_path, model, tokenizer, device="cuda", batch_size=10):
+def md_translate_to_html(md_path, model, tokenizer, device="cuda", batch_size=32, max_batch_tokens=4096, memory=None, max_segment_tokens=160, policy=None, server_url=None, resume=False, metrics=None, budget=None):
+    """
+    resume=True이면 md 파일 옆 <이름>.progress.jsonl에 배치별 진행 상황을 기록하고,
+    중단 후 다시 실행하면 번역되지 않은 문단부터 이어서 번역 (완료되면 파일 삭제)
+    metrics(TranslationMetrics)가 주어지면 배치별 성능 지표를 기록
+    """
     md = get_md_parser()
     with open(md_path, "r", encoding="utf-8") as f:
         md_text = f.read()
+    checkpoint = TranslationCheckpoint(md_path, md_text, get_checkpoint_settings(model, policy, server_url)) if resume else None
     tokens = md.parse(md_text)
-    replace_text_tokens(tokens, model, tokenizer, device=device, batch_size=batch_size)
+    replace_text_tokens(tokens, model, tokenizer, device=device, batch_size=batch_size, max_batch_tokens=max_batch_tokens, memory=memory, max_segment_tokens=max_segment_tokens, policy=policy, server_url=server_url, checkpoint=checkpoint, metrics=metrics, budget=budget)
     html = md.renderer.render(tokens, md.options, {})
+    if checkpoint is not None:
+        checkpoint.clear()
     return html
+
+# 최상위 블록(문단, 제목, 표, 목록 등) 단위로 토큰을 묶는 함수
+def split_block_groups(tokens):
+    groups = []
+    current = []
+    for token in tokens:
+        current.append(token)
+        # 최상위 레벨의 닫는 토큰이나 단독 토큰에서 블록이 끝남
+        if token.level == 0 and token.nesting <= 0:
+            groups.append(current)
+            current = []
+    if current:
+        groups.append(current)
+    return groups
+
+# 스트리밍 파이프라인 함수 (블록 그룹 단위로 번역/렌더링한 HTML 조각을 순서대로 yield)
+def md_translate_to_html_stream(md_path, model, tokenizer, device="cuda", batch_size=32, max_batch_tokens=4096, memory=None, max_segment_tokens=160, policy=None, window_size=64, server_url=None, resume=False, metrics=None, budget=None, on_progress=None):
+    """
+    연속된 블록 그룹을 번역할 문단이 window_size개 이상 모일 때까지 묶어 한 번에 번역하고 바로 렌더링
+    yield된 조각을 순서대로 이어 붙이면 전체 HTML이 되며, 번역 중인 상태(번역 결과, 배치)는 현재 윈도우 크기로 제한됨
+    단, 파싱은 문서 전체를 한 번에 하므로 원문 토큰은 처음에 모두 메모리에 올라가고 렌더링한 그룹부터 해제됨
+    (각주 정의와 참조 링크 정의는 문서 어디에 있든 파싱 때 env에 모여야 앞쪽 블록의 참조가 연결되므로 나눠 파싱하지 않음)
+    resume, metrics는 md_translate_to_html과 같음
+    on_progress가 주어지면 윈도우마다 (번역한 문단 수, 전체 문단 수)로 호출
+    """
+    md = get_md_parser()
+    with open(md_path, "r", encoding="utf-8") as f:
+        md_text = f.read()
+    checkpoint = TranslationCheckpoint(md_path, md_text, get_checkpoint_settings(model, policy, server_url)) if resume else None
+    env = {}
+    groups = split_block_groups(md.parse(md_text, env))
+    del md_text
+    group_texts = [len(collect_translation_units(group)) for group in groups]
+    total_texts = sum(group_texts)
+
+    window = []
+    window_texts = 0
+    index_offset = 0
+    while groups:
+        group = groups.pop(0)
+        window.extend(group)
+        window_texts += group_texts.pop(0)
+        if window_texts >= window_size or not groups:
+            replace_text_tokens(window, model, tokenizer, device=device, batch_size=batch_size, max_batch_tokens=max_batch_tokens, memory=memory, max_segment_tokens=max_segment_tokens, policy=policy, server_url=server_url, checkpoint=checkpoint, index_offset=index_offset, metrics=metrics, budget=budget)
+            yield md.renderer.render(window, md.options, env)
+            index_offset += window_texts
+            if on_progress is not None:
+                on_progress(index_offset, total_texts)
+            window = []
+            window_texts = 0
+    if checkpoint is not None:
+        checkpoint.clear()
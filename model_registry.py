@@ -0,0 +1,141 @@
+# model_registry.py
+# 프로세스 안에서 번역 모델을 한 번만 로드해 재사용하는 레지스트리
+# Streamlit은 위젯을 조작할 때마다 home.py를 다시 실행하지만 import된 모듈은 유지되므로
+# get_model_registry()가 돌려주는 레지스트리에 올라간 모델은 재실행 사이에 그대로 남음
+#
+# 사용 예:
+#   model, tokenizer = get_model_registry().get("aeolian83/mbart-en-ko-ptt-latex", device="cuda")
+#   model, tokenizer = get_model_registry().get("checkpoints/last_checkpoint", device="cuda",
+#                                               tokenizer_name="aeolian83/mbart-en-ko-ptt-latex")
+
+import os
+import gc
+import time
+import threading
+from collections import OrderedDict
+
+import torch
+
+from md_translate import load_mbart_model, get_draft_model, translate_batch
+
+# 로드 직후 warm-up 번역에 쓰는 문장 (CUDA 커널/ONNX 세션 초기화 비용을 첫 요청 전에 치름)
+WARMUP_TEXTS = ["This is a warm-up sentence for the translation model."]
+
+
+# 모델이 차지하는 메모리(바이트) 추정 함수
+def estimate_model_bytes(model):
+    """
+    PyTorch 모델은 state_dict 텐서 크기 합(int8 양자화 가중치 포함),
+    ONNX Runtime 모델은 저장 디렉토리의 .onnx 파일 크기 합, 알 수 없으면 0
+    """
+    if isinstance(model, torch.nn.Module):
+        def tensor_bytes(value):
+            if torch.is_tensor(value):
+                return value.numel() * value.element_size()
+            if isinstance(value, (tuple, list)):
+                return sum(tensor_bytes(v) for v in value)
+            return 0
+        return sum(tensor_bytes(v) for v in model.state_dict().values())
+    model_dir = getattr(model, "model_save_dir", None)
+    if model_dir and os.path.isdir(model_dir):
+        return sum(
+            os.path.getsize(os.path.join(model_dir, name))
+            for name in os.listdir(model_dir)
+            if name.endswith((".onnx", ".onnx_data"))
+        )
+    return 0
+
+
+class ModelRegistry:
+    """
+    (모델 이름, device, backend, 초안 모델)별로 모델과 토크나이저를 한 번만 로드해 보관
+    memory_budget_bytes를 넘으면 가장 오래 사용되지 않은 모델부터 내림 (방금 요청한 모델은 유지)
+    """
+
+    def __init__(self, memory_budget_bytes=None, warmup=True):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.warmup = warmup
+        # 키 → {"model", "tokenizer", "bytes", "load_seconds", "last_used"}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, model_name, device="cuda", backend="torch", tokenizer_name=None, draft_model_name=None):
+        """로드된 모델이 있으면 그대로, 없으면 로드(+warm-up)해서 (model, tokenizer) 반환"""
+        key = (model_name, str(device), backend, draft_model_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._load(model_name, device, backend, tokenizer_name, draft_model_name)
+                self._entries[key] = entry
+                self._evict(keep=key)
+            self._entries.move_to_end(key)
+            entry["last_used"] = time.time()
+            return entry["model"], entry["tokenizer"]
+
+    def _load(self, model_name, device, backend, tokenizer_name, draft_model_name):
+        start = time.perf_counter()
+        model, tokenizer = load_mbart_model(model_name, device=device, backend=backend, tokenizer_name=tokenizer_name, draft_model_name=draft_model_name)
+        load_seconds = time.perf_counter() - start
+        if self.warmup:
+            translate_batch(WARMUP_TEXTS, model, tokenizer, device=device, policy="assisted" if draft_model_name else "fast")
+        model_bytes = estimate_model_bytes(model)
+        draft_model = get_draft_model(model)
+        if draft_model is not None:
+            model_bytes += estimate_model_bytes(draft_model)
+        print(f"모델 로드: {model_name} ({device}, {backend}) {load_seconds:.1f}s, 약 {model_bytes / 2**20:.0f}MB")
+        return {"model": model, "tokenizer": tokenizer, "bytes": model_bytes, "load_seconds": load_seconds, "last_used": time.time()}
+
+    def _evict(self, keep):
+        if self.memory_budget_bytes is None:
+            return
+        evicted = False
+        while self.total_bytes() > self.memory_budget_bytes:
+            key = next((k for k in self._entries if k != keep), None)
+            if key is None:
+                break
+            self._entries.pop(key)
+            print(f"메모리 예산 초과로 모델을 내립니다: {key[0]} ({key[1]}, {key[2]})")
+            evicted = True
+        if evicted:
+            gc.collect()
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+
+    def unload(self, model_name, device="cuda", backend="torch", draft_model_name=None):
+        with self._lock:
+            self._entries.pop((model_name, str(device), backend, draft_model_name), None)
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def total_bytes(self):
+        return sum(entry["bytes"] for entry in self._entries.values())
+
+    def loaded(self):
+        """로드된 모델 목록 (오래 사용되지 않은 순)"""
+        with self._lock:
+            return [
+                {"model": k[0], "device": k[1], "backend": k[2], "draft_model": k[3], "bytes": e["bytes"], "load_seconds": e["load_seconds"], "last_used": e["last_used"]}
+                for k, e in self._entries.items()
+            ]
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+# 프로세스 전체에서 공유하는 레지스트리 반환 함수
+def get_model_registry():
+    """
+    메모리 예산은 환경변수 TRANSLATOR_MODEL_BUDGET_MB(없으면 무제한),
+    warm-up은 TRANSLATOR_MODEL_WARMUP=0이면 생략
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            budget_mb = os.environ.get("TRANSLATOR_MODEL_BUDGET_MB")
+            _registry = ModelRegistry(
+                memory_budget_bytes=int(float(budget_mb) * 2**20) if budget_mb else None,
+                warmup=os.environ.get("TRANSLATOR_MODEL_WARMUP", "1") != "0",
+            )
+        return _registry
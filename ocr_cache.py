@@ -0,0 +1,203 @@
+# ocr_cache.py
+# PDF 내용 해시로 OCR 결과(페이지별 마크다운, 이미지)를 재사용하는 캐시
+# - 문서 키: sha256(PDF 바이트) + OCR 버전 → 같은 PDF를 다시 올리면 OCR 없이 바로 마크다운/이미지 복원
+# - 페이지 키: 페이지 내용 해시(콘텐츠 스트림, 텍스트, 이미지) + OCR 버전 + 페이지의 OCR/텍스트 모드
+#   → arXiv 개정판처럼 일부 페이지만 바뀐 PDF는 바뀐 페이지만 OCR
+# OCR 버전에는 magic-pdf 버전과 설정 파일(magic-pdf.json) 해시가 들어가므로 모델이나 설정이 바뀌면 캐시를 쓰지 않음
+#
+# 저장 구조 (cache_dir 아래):
+#   docs/<문서 키>.json   {"page_modes", "page_keys"}
+#   pages/<페이지 키>.json {"markdown", "images"}
+#   images/<magic_pdf 이미지 파일>
+#
+# 사용 예:
+#   cache = OCRCache("cache/ocr")
+#   md_path = cache.ocr_pdf(pdf_bytes, output_img_dir, output_md_dir, md_filename="output.md")
+
+import os
+import re
+import json
+import hashlib
+import threading
+
+from image_store import link_file
+
+# 캐시 형식이 바뀌면 올려서 이전 항목을 무효화
+CACHE_FORMAT = 2
+
+# 캐시에 저장하는 마크다운의 이미지 경로 접두사 (복원할 때 실제 이미지 폴더로 바꿈)
+IMAGE_PREFIX = "ocr-cache-images"
+IMAGE_PATTERN = re.compile(re.escape(IMAGE_PREFIX) + r"/([^)\s]+)")
+
+
+# OCR 결과에 영향을 주는 버전 문자열 함수 (magic-pdf 버전 + 설정 파일 해시 + 캐시 형식)
+def get_ocr_version():
+    from importlib.metadata import version, PackageNotFoundError
+
+    try:
+        magic_pdf_version = version("magic-pdf")
+    except PackageNotFoundError:
+        magic_pdf_version = "unknown"
+    config_name = os.getenv("MINERU_TOOLS_CONFIG_JSON", "magic-pdf.json")
+    config_path = config_name if os.path.isabs(config_name) else os.path.join(os.path.expanduser("~"), config_name)
+    config_hash = "none"
+    if os.path.exists(config_path):
+        with open(config_path, "rb") as f:
+            config_hash = hashlib.sha256(f.read()).hexdigest()[:16]
+    return f"magic-pdf={magic_pdf_version}|config={config_hash}|format={CACHE_FORMAT}"
+
+
+# 페이지별 내용 해시 함수 (OCR 없이 PyMuPDF로 콘텐츠 스트림, 텍스트 레이어, 이미지 스트림을 해시)
+def hash_pdf_pages(pdf_bytes):
+    import fitz
+
+    page_hashes = []
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        for page in doc:
+            h = hashlib.sha256()
+            h.update(repr(tuple(page.rect)).encode())
+            h.update(page.read_contents())
+            # 폰트 서브셋이 바뀌어 같은 콘텐츠 스트림이 다른 글자가 되는 경우도 구분
+            h.update(page.get_text("text").encode("utf-8"))
+            for image in page.get_images(full=True):
+                h.update(doc.xref_stream_raw(image[0]) or b"")
+            page_hashes.append(h.hexdigest())
+    return page_hashes
+
+
+def _contiguous_runs(page_ids, max_pages=None):
+    """정렬된 페이지 번호를 연속 구간 [(시작, 끝), ...]으로 묶음 (max_pages가 있으면 그 길이로 자름)"""
+    runs = []
+    for page_id in page_ids:
+        if runs and runs[-1][1] == page_id - 1 and (max_pages is None or page_id - runs[-1][0] < max_pages):
+            runs[-1][1] = page_id
+        else:
+            runs.append([page_id, page_id])
+    return [tuple(run) for run in runs]
+
+
+class OCRCache:
+    """
+    PDF 내용 해시로 OCR 결과를 재사용하는 디스크 캐시
+    문서 전체가 같으면 페이지 해시 계산도 없이 복원하고, 다르면 페이지별로 캐시에 없는 페이지만 OCR
+    num_workers > 1이면 OCR할 구간을 여러 프로세스에서 나눠 분석 (ocr_pdf.analyze_pdf)
+    """
+
+    def __init__(self, cache_dir, num_workers=1):
+        self.cache_dir = cache_dir
+        self.num_workers = num_workers
+        self.docs_dir = os.path.join(cache_dir, "docs")
+        self.pages_dir = os.path.join(cache_dir, "pages")
+        self.images_dir = os.path.join(cache_dir, "images")
+        for path in (self.docs_dir, self.pages_dir, self.images_dir):
+            os.makedirs(path, exist_ok=True)
+        self.version = get_ocr_version()
+        self._lock = threading.Lock()
+        self.last_stats = None
+
+    def _key(self, *parts):
+        return hashlib.sha256("|".join([self.version, *parts]).encode("utf-8")).hexdigest()
+
+    def _read(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, path, data):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _page_path(self, page_key):
+        return os.path.join(self.pages_dir, f"{page_key}.json")
+
+    def _restore(self, markdown, output_img_dir, img_path_prefix):
+        """캐시 마크다운의 이미지를 output_img_dir에 하드링크하고 이미지 경로를 img_path_prefix 기준으로 바꿔 반환"""
+        for name in IMAGE_PATTERN.findall(markdown):
+            link_file(os.path.join(self.images_dir, name), os.path.join(output_img_dir, name))
+        return markdown.replace(IMAGE_PREFIX + "/", img_path_prefix.rstrip("/") + "/")
+
+    def _load_pages(self, page_keys):
+        """캐시에 있는 페이지 {페이지 번호: 마크다운} (이미지 파일이 빠진 페이지는 없는 것으로 취급)"""
+        pages = {}
+        for page_id, page_key in enumerate(page_keys):
+            entry = self._read(self._page_path(page_key))
+            if entry is None:
+                continue
+            if all(os.path.exists(os.path.join(self.images_dir, name)) for name in entry["images"]):
+                pages[page_id] = entry["markdown"]
+        return pages
+
+    def _ocr_run(self, pdf_bytes, start_page_id, end_page_id, page_modes, page_keys):
+        from ocr_pdf import ocr_pdf_page_markdown
+
+        pages = ocr_pdf_page_markdown(
+            pdf_bytes, self.images_dir, start_page_id, end_page_id, page_modes, IMAGE_PREFIX, num_workers=self.num_workers,
+        )
+        for page_id, markdown in pages.items():
+            images = sorted(set(IMAGE_PATTERN.findall(markdown)))
+            self._write(self._page_path(page_keys[page_id]), {"markdown": markdown, "images": images})
+        return pages
+
+    # 페이지 묶음 단위 OCR 함수 (ocr_pdf.iter_ocr_pdf_pages와 같은 (시작, 끝, 전체 페이지 수, 마크다운)을 yield)
+    def iter_pages(self, pdf_bytes, output_img_dir, pages_per_chunk=None, img_path_prefix=None):
+        """
+        캐시에 있는 페이지는 바로, 없는 페이지는 연속 구간별로 OCR해 캐시에 저장한 뒤 yield
+        pages_per_chunk가 None이면 캐시에 없는 연속 구간을 한 번에 OCR (페이지 간 문단 병합 유지)
+        마크다운의 이미지 경로는 img_path_prefix 기준 (없으면 output_img_dir)
+        """
+        os.makedirs(output_img_dir, exist_ok=True)
+        doc_path = os.path.join(self.docs_dir, f"{self._key(hashlib.sha256(pdf_bytes).hexdigest())}.json")
+        doc = self._read(doc_path)
+        pages = self._load_pages(doc["page_keys"]) if doc else {}
+        if doc is None or len(pages) < len(doc["page_keys"]):
+            from ocr_pdf import classify_pages
+
+            page_modes = classify_pages(pdf_bytes)
+            page_keys = [
+                self._key("ocr" if use_ocr else "txt", page_hash)
+                for use_ocr, page_hash in zip(page_modes, hash_pdf_pages(pdf_bytes))
+            ]
+            doc = {"page_modes": page_modes, "page_keys": page_keys}
+            pages = self._load_pages(doc["page_keys"])
+        page_count = len(doc["page_keys"])
+        cached_pages = len(pages)
+
+        # 캐시된 구간과 OCR할 구간을 페이지 순서대로 처리
+        missing = [page_id for page_id in range(page_count) if page_id not in pages]
+        runs = [(start, end, False) for start, end in _contiguous_runs(missing, pages_per_chunk)]
+        runs += [(start, end, True) for start, end in _contiguous_runs(sorted(pages), pages_per_chunk or page_count)]
+        for start, end, cached in sorted(runs):
+            if not cached:
+                pages.update(self._ocr_run(pdf_bytes, start, end, doc["page_modes"], doc["page_keys"]))
+            markdown = "\n\n".join(pages[page_id] for page_id in range(start, end + 1) if pages[page_id])
+            yield start, end, page_count, self._restore(markdown, output_img_dir, img_path_prefix or output_img_dir)
+
+        with self._lock:
+            self._write(doc_path, doc)
+        ocr_mode_pages = sum(doc["page_modes"])
+        self.last_stats = {
+            "pages": page_count,
+            "cached_pages": cached_pages,
+            "analyzed_pages": len(missing),
+            "ocr_mode_pages": ocr_mode_pages,
+            "text_mode_pages": page_count - ocr_mode_pages,
+        }
+        print(
+            f"OCR 캐시: 전체 {page_count}페이지 중 {cached_pages}페이지 재사용, {len(missing)}페이지 분석 "
+            f"(텍스트 추출 {page_count - ocr_mode_pages}페이지, OCR {ocr_mode_pages}페이지)"
+        )
+
+    # 캐시를 거치는 ocr_pdf 대체 함수 (반환: 저장한 마크다운 경로)
+    def ocr_pdf(self, pdf_bytes, output_img_dir, output_md_dir, md_filename="output.md"):
+        os.makedirs(output_md_dir, exist_ok=True)
+        # 이미지 경로는 마크다운 파일 기준 상대 경로 (출력 폴더를 옮겨도 유지)
+        img_path_prefix = os.path.relpath(output_img_dir, output_md_dir)
+        chunks = [markdown for _, _, _, markdown in self.iter_pages(pdf_bytes, output_img_dir, img_path_prefix=img_path_prefix)]
+        md_path = os.path.join(output_md_dir, md_filename)
+        with open(md_path, "w", encoding="utf-8") as f:
+            f.write("\n\n".join(chunk for chunk in chunks if chunk))
+        return md_path
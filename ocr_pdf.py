@@ -1,40 +1,273 @@
 # ocr_pdf.py
 
 import os
-from magic_pdf.data.data_reader_writer import FileBasedDataWriter, FileBasedDataReader
+import json
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from magic_pdf.data.data_reader_writer import FileBasedDataWriter, FileBasedDataReader, DataWriter
 from magic_pdf.data.dataset import PymuDocDataset
 from magic_pdf.model.doc_analyze_by_custom_model import doc_analyze
-from magic_pdf.config.enums import SupportedPdfParseMethod
+from magic_pdf.config.make_content_config import MakeMode, DropMode
+from magic_pdf.dict2md.ocr_mkcontent import union_make
+from magic_pdf.operators.models import InferenceResult
+from ocr_worker import get_default_pool
+from image_store import get_default_store
+
+# 페이지별 OCR/텍스트 모드 판단 기준
+# 텍스트 레이어 글자(공백 제외)가 이보다 적고 이미지가 페이지를 충분히 덮으면 스캔 페이지로 보고 OCR
+MIN_TEXT_CHARS = 50
+MIN_IMAGE_COVERAGE = 0.5
+# 텍스트 레이어에 깨진 글자(U+FFFD)가 이 비율보다 많으면 텍스트 레이어를 믿지 않고 OCR
+MAX_INVALID_CHAR_RATIO = 0.05
+
+# 페이지 분할 분석 작업 프로세스 초기화 함수 (프로세스마다 torch 스레드를 나눠 코어를 서로 뺏지 않게 함)
+def _init_shard_worker(num_threads):
+    import torch
+    torch.set_num_threads(num_threads)
+
+# 페이지 구간 모델 분석 함수 (작업 프로세스에서 실행, 반환: 구간 페이지들의 model_json)
+def _analyze_shard(pdf_bytes, use_ocr, start_page_id, end_page_id):
+    ds = PymuDocDataset(pdf_bytes)
+    infer_result = ds.apply(doc_analyze, ocr=use_ocr, start_page_id=start_page_id, end_page_id=end_page_id)
+    return infer_result.get_infer_res()[start_page_id:end_page_id + 1]
+
+def analyze_pdf(
+    ds,
+    pdf_bytes: bytes,
+    use_ocr: bool,
+    start_page_id: int = 0,
+    end_page_id: int = None,
+    num_workers: int = 1,
+    pages_per_shard: int = None,
+):
+    """
+    doc_analyze와 같은 InferenceResult 반환, num_workers > 1이면 페이지 구간을 프로세스 풀에서 나눠 분석
+    모델 분석(레이아웃, 수식, 표 인식)은 페이지마다 독립이므로 구간 결과를 페이지 순서대로 이어 붙이고,
+    페이지를 넘는 문단/표/그림 처리는 이어 붙인 결과로 pipe 단계에서 한 번에 하므로 구간 경계의 영향이 없음
+    기본 OCR 작업 프로세스 풀(ocr_worker)이 있으면 새 프로세스를 띄우지 않고 그 풀에 구간을 나눠 줌
+    작업 프로세스마다 모델을 따로 올리므로 GPU 메모리가 부족하면 num_workers를 줄일 것
+    """
+    if end_page_id is None or end_page_id >= len(ds):
+        end_page_id = len(ds) - 1
+    page_count = end_page_id - start_page_id + 1
+    num_workers = max(1, min(num_workers, page_count))
+    if num_workers == 1:
+        return ds.apply(doc_analyze, ocr=use_ocr, start_page_id=start_page_id, end_page_id=end_page_id)
+    pool = get_default_pool()
+
+    # 작업 프로세스보다 구간을 두 배 많이 만들어 페이지마다 다른 분석 시간을 고르게 나눔
+    pages_per_shard = pages_per_shard or math.ceil(page_count / (num_workers * 2))
+    shards = [
+        (start, min(start + pages_per_shard, end_page_id + 1) - 1)
+        for start in range(start_page_id, end_page_id + 1, pages_per_shard)
+    ]
+    if pool is not None:
+        # 기본 OCR 작업 프로세스 풀이 있으면 모델이 이미 올라간 작업 프로세스에 구간을 나눠 줌
+        futures = [pool.submit(_analyze_shard, pdf_bytes, use_ocr, start, end) for start, end in shards]
+        shard_results = [future.result() for future in futures]
+    else:
+        num_threads = max(1, (os.cpu_count() or 1) // num_workers)
+        # CUDA를 쓰는 모델이 있으므로 fork 대신 spawn
+        with ProcessPoolExecutor(
+            max_workers=num_workers, mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_shard_worker, initargs=(num_threads,),
+        ) as executor:
+            futures = [executor.submit(_analyze_shard, pdf_bytes, use_ocr, start, end) for start, end in shards]
+            shard_results = [future.result() for future in futures]
+
+    # 분석하지 않은 페이지는 doc_analyze와 같은 빈 결과로 채움
+    model_json = [
+        {"layout_dets": [], "page_info": {"page_no": page_id, "width": 0, "height": 0}}
+        for page_id in range(len(ds))
+    ]
+    for (start, _), pages in zip(shards, shard_results):
+        model_json[start:start + len(pages)] = pages
+    return InferenceResult(model_json, ds)
+
+class StoreImageWriter(DataWriter):
+    """
+    magic_pdf 이미지 writer 대체: 이미지를 내용 해시로 전역 저장소(image_store)에 한 번만 저장하고
+    output_img_dir에는 저장소 파일의 하드링크를 둠, rewrite로 마크다운의 magic_pdf 파일명을 저장소 이름으로 바꿈
+    """
+
+    def __init__(self, store, output_img_dir):
+        self.store = store
+        self.output_img_dir = output_img_dir
+        self.names = {}
+
+    def write(self, path: str, data: bytes) -> None:
+        name = self.store.put(data, os.path.splitext(path)[1] or ".jpg")
+        self.store.link(name, self.output_img_dir)
+        self.names[os.path.basename(path)] = name
+
+    def rewrite(self, markdown: str) -> str:
+        for old_name, name in self.names.items():
+            markdown = markdown.replace(old_name, name)
+        return markdown
+
+# 이미지 writer 생성 함수 (기본 이미지 저장소가 있으면 StoreImageWriter, 없으면 기존처럼 폴더에 바로 저장)
+def get_image_writer(output_img_dir):
+    store = get_default_store()
+    if store is None:
+        return FileBasedDataWriter(output_img_dir)
+    return StoreImageWriter(store, output_img_dir)
+
+def rewrite_image_names(image_writer, markdown):
+    if isinstance(image_writer, StoreImageWriter):
+        return image_writer.rewrite(markdown)
+    return markdown
+
+# 페이지별 모드 판단 함수 (반환: 페이지마다 OCR이 필요하면 True인 리스트)
+def classify_pages(pdf_bytes: bytes) -> list:
+    """
+    ds.classify()처럼 문서 전체를 한 모드로 정하지 않고, 페이지마다 텍스트 레이어를 쓸 수 있는지 판단
+    텍스트도 이미지도 없는 빈 페이지는 텍스트 모드 (OCR할 내용이 없음)
+    """
+    import fitz
+
+    page_modes = []
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        for page in doc:
+            text = "".join(page.get_text("text").split())
+            invalid_ratio = text.count("\ufffd") / len(text) if text else 0.0
+            page_area = abs(page.rect) or 1.0
+            image_area = sum(abs(fitz.Rect(info["bbox"]) & page.rect) for info in page.get_image_info())
+            scanned = len(text) < MIN_TEXT_CHARS and image_area / page_area >= MIN_IMAGE_COVERAGE
+            page_modes.append(scanned or invalid_ratio > MAX_INVALID_CHAR_RATIO)
+    return page_modes
+
+# 같은 모드가 이어지는 페이지 구간 [(시작, 끝, OCR 여부), ...]
+def get_mode_runs(page_modes, start_page_id, end_page_id):
+    runs = []
+    for page_id in range(start_page_id, end_page_id + 1):
+        use_ocr = page_modes[page_id]
+        if runs and runs[-1][2] == use_ocr:
+            runs[-1][1] = page_id
+        else:
+            runs.append([page_id, page_id, use_ocr])
+    return [tuple(run) for run in runs]
+
+def parse_pdf_pages(
+    ds,
+    pdf_bytes: bytes,
+    image_writer,
+    start_page_id: int,
+    end_page_id: int,
+    page_modes: list,
+    num_workers: int = 1,
+) -> list:
+    """
+    start_page_id~end_page_id 페이지를 모드가 같은 구간별로 분석/파싱해 페이지 순서대로 pdf_info 리스트 반환
+    OCR 페이지 구간은 pipe_ocr_mode, 나머지는 pipe_txt_mode로 처리하고 결과를 페이지 순서대로 합침
+    (모드가 바뀌는 경계에서는 페이지 간 문단 병합이 일어나지 않음)
+    """
+    pdf_info = []
+    for run_start, run_end, use_ocr in get_mode_runs(page_modes, start_page_id, end_page_id):
+        infer_result = analyze_pdf(ds, pdf_bytes, use_ocr, run_start, run_end, num_workers=num_workers)
+        if use_ocr:
+            pipe_result = infer_result.pipe_ocr_mode(image_writer, start_page_id=run_start, end_page_id=run_end)
+        else:
+            pipe_result = infer_result.pipe_txt_mode(image_writer, start_page_id=run_start, end_page_id=run_end)
+        pdf_info.extend(json.loads(pipe_result.get_middle_json())["pdf_info"][run_start:run_end + 1])
+    return pdf_info
+
+# 페이지 모드 집계 출력 함수
+def report_page_modes(page_modes):
+    ocr_pages = sum(page_modes)
+    print(f"페이지 분류: 텍스트 추출 {len(page_modes) - ocr_pages}페이지, OCR {ocr_pages}페이지")
 
 def ocr_pdf(
     pdf_bytes: bytes,
     pdf_file_name: str,
     output_img_dir: str,
     output_md_dir: str,
-    md_filename: str = "mdcontent_1.md"
+    md_filename: str = "mdcontent_1.md",
+    num_workers: int = 1,
 ) -> str:
     """
     PDF 파일 바이트와 파일명, 저장경로를 받아 OCR 수행 후 md 파일을 저장하고 경로를 반환
+    텍스트 레이어가 없는 페이지만 OCR하고 나머지는 텍스트 추출 (classify_pages)
+    num_workers > 1이면 페이지 구간을 여러 프로세스에서 나눠 분석 (결과는 같음)
+    기본 OCR 작업 프로세스 풀(ocr_worker)이 있으면 모델이 미리 올라간 작업 프로세스에서 실행
     """
+    pool = get_default_pool()
+    if pool is not None and num_workers <= 1:
+        return pool.submit(ocr_pdf, pdf_bytes, pdf_file_name, output_img_dir, output_md_dir, md_filename).result()
+
     # 환경 준비
     if not os.path.exists(output_img_dir):
         os.makedirs(output_img_dir, exist_ok=True)
     if not os.path.exists(output_md_dir):
         os.makedirs(output_md_dir, exist_ok=True)
 
-    image_writer = FileBasedDataWriter(output_img_dir)
+    image_writer = get_image_writer(output_img_dir)
     md_writer = FileBasedDataWriter(output_md_dir)
 
-    # 데이터셋 생성 및 분류
+    # 데이터셋 생성 및 페이지별 분류
     ds = PymuDocDataset(pdf_bytes)
-    if ds.classify() == SupportedPdfParseMethod.OCR:
-        infer_result = ds.apply(doc_analyze, ocr=True)
-        pipe_result = infer_result.pipe_ocr_mode(image_writer)
-    else:
-        infer_result = ds.apply(doc_analyze, ocr=False)
-        pipe_result = infer_result.pipe_txt_mode(image_writer)
+    page_modes = classify_pages(pdf_bytes)
+    report_page_modes(page_modes)
+    pdf_info = parse_pdf_pages(ds, pdf_bytes, image_writer, 0, len(ds) - 1, page_modes, num_workers=num_workers)
 
     # 마크다운 저장
     md_save_path = os.path.join(output_md_dir, md_filename)
-    pipe_result.dump_md(md_writer, md_save_path, output_img_dir)
+    # 이미지 경로는 마크다운 파일 기준 상대 경로 (출력 폴더를 옮겨도 유지)
+    img_path_prefix = os.path.relpath(output_img_dir, output_md_dir)
+    md_content = union_make(pdf_info, MakeMode.MM_MD, DropMode.NONE, img_path_prefix)
+    md_content = rewrite_image_names(image_writer, md_content)
+    md_writer.write_string(md_save_path, md_content)
     return md_save_path
+
+def iter_ocr_pdf_pages(
+    pdf_bytes: bytes,
+    output_img_dir: str,
+    pages_per_chunk: int = 4,
+    img_path_prefix: str = None,
+):
+    """
+    PDF를 pages_per_chunk 페이지씩 분석해 (시작 페이지, 끝 페이지, 전체 페이지 수, 마크다운)을 순서대로 yield
+    doc_analyze와 pipe_*_mode에 같은 페이지 범위를 넘기므로 범위 밖 페이지는 분석하지 않음
+    마크다운의 이미지 경로는 img_path_prefix 기준 (없으면 output_img_dir)
+    (묶음 경계에서는 magic_pdf의 페이지 간 문단 병합이 일어나지 않음)
+    """
+    page_modes = classify_pages(pdf_bytes)
+    report_page_modes(page_modes)
+    page_count = len(page_modes)
+    for start_page_id in range(0, page_count, pages_per_chunk):
+        end_page_id = min(start_page_id + pages_per_chunk, page_count) - 1
+        pages = ocr_pdf_page_markdown(
+            pdf_bytes, output_img_dir, start_page_id, end_page_id, page_modes, img_path_prefix or output_img_dir,
+        )
+        yield start_page_id, end_page_id, page_count, "\n\n".join(markdown for markdown in pages.values() if markdown)
+
+def ocr_pdf_page_markdown(
+    pdf_bytes: bytes,
+    output_img_dir: str,
+    start_page_id: int,
+    end_page_id: int,
+    page_modes: list,
+    img_path_prefix: str,
+    num_workers: int = 1,
+) -> dict:
+    """
+    start_page_id~end_page_id 페이지를 분석해 {페이지 번호: 마크다운} 반환 (내용이 없는 페이지는 빈 문자열)
+    page_modes는 classify_pages 결과, 이미지는 output_img_dir에 저장하고 마크다운의 이미지 경로는 img_path_prefix 기준
+    페이지별 마크다운을 순서대로 "\n\n"으로 이으면 같은 범위의 get_markdown 결과와 같음
+    """
+    pool = get_default_pool()
+    if pool is not None and num_workers <= 1:
+        return pool.submit(
+            ocr_pdf_page_markdown, pdf_bytes, output_img_dir, start_page_id, end_page_id, page_modes, img_path_prefix,
+        ).result()
+
+    if not os.path.exists(output_img_dir):
+        os.makedirs(output_img_dir, exist_ok=True)
+    image_writer = get_image_writer(output_img_dir)
+
+    ds = PymuDocDataset(pdf_bytes)
+    pdf_info = parse_pdf_pages(ds, pdf_bytes, image_writer, start_page_id, end_page_id, page_modes, num_workers=num_workers)
+    return {
+        page_id: rewrite_image_names(image_writer, union_make([page_info], MakeMode.MM_MD, DropMode.NONE, img_path_prefix))
+        for page_id, page_info in zip(range(start_page_id, end_page_id + 1), pdf_info)
+    }
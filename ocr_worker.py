@@ -0,0 +1,416 @@
+# ocr_worker.py
+# magic_pdf 레이아웃/수식/OCR 모델을 한 번만 올려 두고 PDF 작업을 계속 받아 처리하는 상주 OCR 작업 프로세스 풀
+# 짧은 논문을 연달아 처리할 때 문서마다 모델을 초기화하는 시간을 없앰
+# - 작업 프로세스는 시작할 때 모델을 미리 로드(preload)하고 준비되면 알림
+# - 부모 프로세스의 배분 스레드가 쉬고 있는 작업 프로세스에 작업을 하나씩 보내고 결과를 Future로 돌려줌
+# - 작업 프로세스는 heartbeat_interval마다 신호를 보내며, 죽거나 heartbeat_timeout 동안 신호가 없거나
+#   작업 하나가 task_timeout보다 오래 걸리면 다시 시작하고, 처리 중이던 작업은 max_retries번까지 다시 실행
+#
+# 사용 예:
+#   pool = OCRWorkerPool(num_workers=2)
+#   result = pool.ocr_pdf(pdf_bytes, "paper.pdf", img_dir, md_dir, md_filename="output.md")
+#   result["md_path"], result["image_paths"]
+#
+#   # ocr_pdf.ocr_pdf가 자동으로 풀을 쓰게 하려면 (또는 환경변수 OCR_WORKER_POOL=작업 프로세스 수)
+#   set_default_pool(pool)
+
+import os
+import re
+import time
+import atexit
+import threading
+import traceback
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing.connection import wait
+
+# 작업 프로세스 안에서는 기본 풀을 쓰지 않음 (ocr_pdf가 자기 자신에게 작업을 보내지 않도록)
+_IN_WORKER = False
+_DEFAULT_POOL = None
+_DEFAULT_POOL_LOCK = threading.Lock()
+
+
+class OCRWorkerError(RuntimeError):
+    """작업 프로세스가 작업 도중 죽거나 응답이 없어 재시도 횟수를 넘긴 경우"""
+
+
+class _RemoteTraceback(Exception):
+    """작업 프로세스에서 난 예외의 traceback (ProcessPoolExecutor처럼 __cause__로 붙임)"""
+
+    def __init__(self, trace):
+        self.trace = trace
+
+    def __str__(self):
+        return f"\n(OCR 작업 프로세스)\n{self.trace}"
+
+
+# 모델 미리 로드 함수 (doc_analyze와 pipe 단계가 쓰는 모델을 ModelSingleton/AtomModelSingleton에 올려 둠)
+def preload_models():
+    from magic_pdf.model.doc_analyze_by_custom_model import ModelSingleton
+    from magic_pdf.model.sub_modules.model_init import AtomModelSingleton
+
+    start = time.perf_counter()
+    # BatchAnalyze는 ocr 여부와 관계없이 ocr=True 키의 모델을 씀
+    ModelSingleton().get_model(ocr=True, show_log=False, lang=None, layout_model=None, formula_enable=None, table_enable=None)
+    # pipe 단계에서 텍스트 스팬을 인식하는 OCR 모델 (pdf_parse_union_core_v2와 같은 설정)
+    AtomModelSingleton().get_atom_model(atom_model_name="ocr", ocr_show_log=False, det_db_box_thresh=0.3, lang=None)
+    return time.perf_counter() - start
+
+
+# 작업 프로세스 안에서 ocr_pdf를 실행하는 작업 함수 (반환: 마크다운 경로와 마크다운이 참조하는 이미지 경로)
+def _ocr_task(pdf_bytes, pdf_file_name, output_img_dir, output_md_dir, md_filename):
+    from ocr_pdf import ocr_pdf
+
+    md_path = ocr_pdf(pdf_bytes, pdf_file_name, output_img_dir, output_md_dir, md_filename=md_filename)
+    with open(md_path, "r", encoding="utf-8") as f:
+        markdown = f.read()
+    # 마크다운의 이미지 경로는 마크다운 파일 기준 상대 경로
+    md_dir = os.path.dirname(md_path)
+    image_paths = sorted({
+        os.path.normpath(os.path.join(md_dir, ref)) for ref in re.findall(r"!\[[^\]]*\]\(([^)\s]+)\)", markdown)
+    })
+    return {"md_path": md_path, "image_paths": image_paths}
+
+
+def _ping_task():
+    return os.getpid()
+
+
+# 작업 프로세스 본체 (spawn으로 시작, conn으로 부모와 통신)
+def _worker_main(conn, preload, heartbeat_interval):
+    global _IN_WORKER
+    _IN_WORKER = True
+    send_lock = threading.Lock()
+
+    def send(message):
+        with send_lock:
+            conn.send(message)
+
+    # 모델 로드나 긴 작업 중에도 살아 있음을 알림 (torch 연산은 GIL을 놓으므로 계속 보내짐)
+    def heartbeat():
+        while True:
+            time.sleep(heartbeat_interval)
+            try:
+                send(("heartbeat", None, None))
+            except (OSError, EOFError):
+                return
+
+    threading.Thread(target=heartbeat, name="ocr-heartbeat", daemon=True).start()
+    try:
+        preload_seconds = preload_models() if preload else 0.0
+    except Exception:
+        send(("failed", None, traceback.format_exc()))
+        return
+    try:
+        send(("ready", None, preload_seconds))
+    except (OSError, EOFError):
+        return
+
+    while True:
+        try:
+            message = conn.recv()
+        except (OSError, EOFError):
+            return
+        if message is None:
+            return
+        task_id, fn, args, kwargs = message
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            trace = traceback.format_exc()
+            try:
+                send(("error", task_id, (e, trace)))
+            except Exception:
+                # pickle할 수 없는 예외는 메시지만 보냄
+                send(("error", task_id, (RuntimeError(f"{type(e).__name__}: {e}"), trace)))
+        else:
+            send(("done", task_id, result))
+
+
+class _Task:
+    def __init__(self, task_id, fn, args, kwargs):
+        self.id = task_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.attempts = 0
+
+
+class _Worker:
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.conn = None
+        self.ready = False
+        self.task = None
+        self.task_started_at = None
+        self.started_at = None
+        self.last_heartbeat = None
+        self.restarts = 0
+        self.tasks_done = 0
+        self.preload_seconds = None
+        self.failed = None
+
+
+class OCRWorkerPool:
+    """
+    모델을 미리 올린 상주 OCR 작업 프로세스 풀
+    submit(fn, *args)는 concurrent.futures.Executor처럼 Future를 반환 (fn은 모듈 최상위 함수여야 함)
+    """
+
+    def __init__(
+        self,
+        num_workers=1,
+        preload=True,
+        heartbeat_interval=5.0,
+        heartbeat_timeout=300.0,
+        task_timeout=None,
+        max_retries=1,
+    ):
+        self.num_workers = max(1, num_workers)
+        self.preload = preload
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.task_timeout = task_timeout
+        self.max_retries = max_retries
+        # CUDA를 쓰는 모델이 있으므로 fork 대신 spawn
+        self._context = multiprocessing.get_context("spawn")
+        self._workers = [_Worker(i) for i in range(self.num_workers)]
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._wakeup_recv, self._wakeup_send = self._context.Pipe(duplex=False)
+        self._next_id = 0
+        self._closed = False
+        for worker in self._workers:
+            self._start_worker(worker)
+        self._dispatcher = threading.Thread(target=self._dispatch, name="ocr-pool-dispatcher", daemon=True)
+        self._dispatcher.start()
+        # daemon이 아닌 작업 프로세스를 multiprocessing이 종료 시 기다리지 않도록 먼저 정리
+        atexit.register(self.shutdown, wait=False)
+
+    def _start_worker(self, worker):
+        parent_conn, child_conn = self._context.Pipe()
+        worker.process = self._context.Process(
+            target=_worker_main, args=(child_conn, self.preload, self.heartbeat_interval),
+            # 작업 안에서 페이지 분할 분석(ocr_pdf(num_workers > 1))이 하위 프로세스를 띄울 수 있도록 daemon이 아님
+            # (종료는 shutdown이 맡고, 부모가 갑자기 죽으면 연결이 끊겨 작업 프로세스도 끝남)
+            name=f"ocr-worker-{worker.index}", daemon=False,
+        )
+        worker.process.start()
+        child_conn.close()
+        worker.conn = parent_conn
+        worker.ready = False
+        worker.task = None
+        worker.started_at = time.time()
+        worker.last_heartbeat = time.time()
+
+    def _restart_worker(self, worker, reason):
+        print(f"OCR 작업 프로세스 {worker.index} 재시작: {reason}")
+        task = worker.task
+        if worker.process.is_alive():
+            worker.process.kill()
+        worker.process.join(timeout=5)
+        worker.conn.close()
+        worker.restarts += 1
+        if task is not None:
+            # 처리 중이던 작업은 재시도 횟수 안에서 맨 앞에 다시 넣음
+            if task.attempts <= self.max_retries:
+                self._pending.appendleft(task)
+            else:
+                task.future.set_exception(OCRWorkerError(f"OCR 작업 프로세스가 작업 도중 중단되었습니다 ({reason})"))
+        if not self._closed:
+            self._start_worker(worker)
+
+    def submit(self, fn, *args, **kwargs):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("닫힌 OCR 작업 프로세스 풀에는 작업을 넣을 수 없습니다")
+            task = _Task(self._next_id, fn, args, kwargs)
+            self._next_id += 1
+            self._pending.append(task)
+        self._wakeup_send.send(None)
+        return task.future
+
+    def ocr_pdf(self, pdf_bytes, pdf_file_name, output_img_dir, output_md_dir, md_filename="mdcontent_1.md"):
+        """작업 프로세스에서 ocr_pdf 실행 (반환: {"md_path", "image_paths"})"""
+        return self.submit(_ocr_task, pdf_bytes, pdf_file_name, output_img_dir, output_md_dir, md_filename).result()
+
+    def _assign(self):
+        if all(worker.failed for worker in self._workers):
+            while self._pending:
+                self._pending.popleft().future.set_exception(OCRWorkerError(f"OCR 모델 로드 실패:\n{self._workers[0].failed}"))
+            return
+        for worker in self._workers:
+            if not self._pending:
+                return
+            if worker.ready and worker.task is None:
+                task = self._pending.popleft()
+                # 재시도하는 작업은 이미 실행 중 상태
+                if task.attempts == 0 and not task.future.set_running_or_notify_cancel():
+                    continue
+                task.attempts += 1
+                worker.task = task
+                worker.task_started_at = time.time()
+                try:
+                    worker.conn.send((task.id, task.fn, task.args, task.kwargs))
+                except (OSError, EOFError) as e:
+                    self._restart_worker(worker, f"작업 전송 실패 ({e})")
+                except Exception as e:
+                    # 함수나 인자를 pickle할 수 없는 경우 작업만 실패 처리
+                    worker.task = None
+                    task.future.set_exception(e)
+
+    def _handle(self, worker, kind, task_id, payload):
+        worker.last_heartbeat = time.time()
+        if kind == "ready":
+            worker.ready = True
+            worker.preload_seconds = payload
+        elif kind == "failed":
+            # 모델 로드 실패는 다시 시작해도 같으므로 이 작업 프로세스는 다시 시작하지 않음
+            print(f"OCR 작업 프로세스 {worker.index} 모델 로드 실패:\n{payload}")
+            worker.failed = payload
+        elif kind in ("done", "error") and worker.task is not None and worker.task.id == task_id:
+            task, worker.task = worker.task, None
+            if kind == "done":
+                worker.tasks_done += 1
+                task.future.set_result(payload)
+            else:
+                error, trace = payload
+                error.__cause__ = _RemoteTraceback(trace)
+                task.future.set_exception(error)
+
+    def _dispatch(self):
+        while True:
+            with self._lock:
+                if self._closed:
+                    return
+                self._assign()
+                connections = {worker.conn: worker for worker in self._workers}
+                sentinels = {worker.process.sentinel: worker for worker in self._workers}
+            ready = wait([self._wakeup_recv, *connections, *sentinels], timeout=self.heartbeat_interval)
+            with self._lock:
+                if self._closed:
+                    return
+                if self._wakeup_recv in ready:
+                    while self._wakeup_recv.poll():
+                        self._wakeup_recv.recv()
+                for conn in ready:
+                    worker = connections.get(conn)
+                    if worker is None or worker.conn is not conn:
+                        continue
+                    try:
+                        while conn.poll():
+                            self._handle(worker, *conn.recv())
+                    except (OSError, EOFError):
+                        pass
+                # 상태 확인: 죽은 프로세스, heartbeat가 끊긴 프로세스는 다시 시작
+                now = time.time()
+                for worker in self._workers:
+                    if worker.failed:
+                        continue
+                    if not worker.process.is_alive():
+                        self._restart_worker(worker, f"프로세스 종료 (exit code {worker.process.exitcode})")
+                    elif now - worker.last_heartbeat > self.heartbeat_timeout:
+                        self._restart_worker(worker, f"{self.heartbeat_timeout:.0f}초 동안 응답 없음")
+                    elif (
+                        self.task_timeout is not None and worker.task is not None
+                        and now - worker.task_started_at > self.task_timeout
+                    ):
+                        # GIL을 놓고 멈춘 작업(I/O 대기 등)은 heartbeat가 계속 오므로 작업 시간으로 확인
+                        self._restart_worker(worker, f"작업이 {self.task_timeout:.0f}초를 넘김")
+
+    def wait_ready(self, timeout=None):
+        """모든 작업 프로세스의 모델 로드가 끝날 때까지 대기 (반환: 모두 준비되었는지)"""
+        deadline = None if timeout is None else time.time() + timeout
+        while not all(worker.ready for worker in self._workers):
+            if self._closed or (deadline is not None and time.time() > deadline):
+                return False
+            time.sleep(0.1)
+        return True
+
+    def ping(self, timeout=10.0):
+        """작업 프로세스 하나가 실제로 작업을 받아 처리하는지 확인 (반환: 응답한 프로세스 pid, 없으면 None)"""
+        try:
+            return self.submit(_ping_task).result(timeout=timeout)
+        except Exception:
+            return None
+
+    def health(self):
+        """작업 프로세스별 상태 (살아 있는지, 준비되었는지, 처리 중인 작업, 마지막 heartbeat 이후 초, 재시작 횟수)"""
+        now = time.time()
+        with self._lock:
+            return [
+                {
+                    "index": worker.index,
+                    "pid": worker.process.pid,
+                    "alive": worker.process.is_alive(),
+                    "ready": worker.ready,
+                    "busy": worker.task is not None,
+                    "heartbeat_age": now - worker.last_heartbeat,
+                    "restarts": worker.restarts,
+                    "tasks_done": worker.tasks_done,
+                    "preload_seconds": worker.preload_seconds,
+                    "failed": worker.failed is not None,
+                }
+                for worker in self._workers
+            ]
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        """wait이면 대기 중이거나 처리 중인 작업이 모두 끝난 뒤 작업 프로세스를 종료"""
+        with self._lock:
+            if cancel_futures:
+                while self._pending:
+                    self._pending.popleft().future.cancel()
+        while wait and not self._closed:
+            with self._lock:
+                if not self._pending and all(worker.task is None for worker in self._workers):
+                    break
+            time.sleep(0.1)
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        atexit.unregister(self.shutdown)
+        self._wakeup_send.send(None)
+        self._dispatcher.join()
+        for worker in self._workers:
+            try:
+                worker.conn.send(None)
+            except (OSError, EOFError):
+                pass
+        for worker in self._workers:
+            worker.process.join(timeout=None if wait else 0)
+            if worker.process.is_alive():
+                worker.process.kill()
+            worker.conn.close()
+            if worker.task is not None:
+                worker.task.future.set_exception(OCRWorkerError("OCR 작업 프로세스 풀이 닫혔습니다"))
+        for task in self._pending:
+            task.future.set_exception(OCRWorkerError("OCR 작업 프로세스 풀이 닫혔습니다"))
+        self._pending.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+
+# 기본 풀 지정 함수 (ocr_pdf.ocr_pdf와 analyze_pdf가 이 풀로 작업을 보냄, None이면 해제)
+def set_default_pool(pool):
+    global _DEFAULT_POOL
+    with _DEFAULT_POOL_LOCK:
+        _DEFAULT_POOL = pool
+
+
+# 기본 풀 반환 함수 (지정된 풀이 없고 환경변수 OCR_WORKER_POOL이 있으면 그 수만큼 작업 프로세스로 생성)
+def get_default_pool():
+    global _DEFAULT_POOL
+    if _IN_WORKER:
+        return None
+    with _DEFAULT_POOL_LOCK:
+        if _DEFAULT_POOL is None and int(os.environ.get("OCR_WORKER_POOL", "0")) > 0:
+            _DEFAULT_POOL = OCRWorkerPool(num_workers=int(os.environ["OCR_WORKER_POOL"]))
+        return _DEFAULT_POOL
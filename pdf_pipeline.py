@@ -0,0 +1,118 @@
+# pdf_pipeline.py
+# OCR과 번역을 페이지 묶음 단위로 겹쳐 실행하는 스트리밍 파이프라인
+# OCR 스레드가 iter_ocr_pdf_pages로 페이지 묶음의 마크다운을 큐에 넣으면,
+# 메인 스레드가 큐에서 꺼내 바로 번역/렌더링하므로 전체 시간이 대략 느린 단계의 시간으로 줄어듦
+#
+# 사용 예:
+#   for start, end, html in iter_pdf_translation(pdf_bytes, img_dir, md_dir, model, tokenizer, device="cuda"):
+#       ...
+
+import os
+import time
+import queue
+import threading
+
+from md_translate import get_md_parser, replace_text_tokens
+
+# OCR 스레드가 끝났음을 알리는 표시
+_DONE = object()
+
+
+def _put(chunks, item, stop):
+    """번역 쪽이 멈췄으면(stop) 기다리지 않고 False 반환"""
+    while not stop.is_set():
+        try:
+            chunks.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _run_ocr(pdf_bytes, output_img_dir, img_path_prefix, pages_per_chunk, chunks, stop, ocr_cache=None):
+    if ocr_cache is not None:
+        pages = ocr_cache.iter_pages(pdf_bytes, output_img_dir, pages_per_chunk=pages_per_chunk, img_path_prefix=img_path_prefix)
+    else:
+        from ocr_pdf import iter_ocr_pdf_pages
+        pages = iter_ocr_pdf_pages(pdf_bytes, output_img_dir, pages_per_chunk=pages_per_chunk, img_path_prefix=img_path_prefix)
+
+    try:
+        for item in pages:
+            # 번역이 밀리면 큐 크기(max_pending_chunks)만큼만 앞서 나감
+            if not _put(chunks, item, stop):
+                return
+        _put(chunks, _DONE, stop)
+    except Exception as e:
+        _put(chunks, e, stop)
+
+
+# 페이지 묶음 번역 함수 (반환: (시작 페이지, 끝 페이지, HTML 조각)을 yield하는 제너레이터)
+def iter_pdf_translation(
+    pdf_bytes,
+    output_img_dir,
+    output_md_dir,
+    model,
+    tokenizer,
+    md_filename="output.md",
+    pages_per_chunk=4,
+    max_pending_chunks=2,
+    on_progress=None,
+    ocr_cache=None,
+    **translate_kwargs,
+):
+    """
+    OCR이 끝난 페이지 묶음부터 번역해 HTML 조각을 yield하고, 전체 마크다운은 output_md_dir/md_filename에 저장
+    translate_kwargs는 replace_text_tokens에 그대로 전달 (device, memory, policy, server_url, metrics, budget 등)
+    on_progress가 주어지면 묶음마다 (번역까지 끝난 페이지 수, 전체 페이지 수)로 호출
+    ocr_cache(OCRCache)가 주어지면 캐시에 있는 페이지는 OCR 없이 바로 번역
+    묶음마다 따로 파싱하므로 묶음을 넘나드는 각주 참조는 연결되지 않음
+    """
+    os.makedirs(output_md_dir, exist_ok=True)
+    md_path = os.path.join(output_md_dir, md_filename)
+    tmp_path = md_path + ".tmp"
+    chunks = queue.Queue(maxsize=max_pending_chunks)
+    stop = threading.Event()
+    ocr_thread = threading.Thread(
+        target=_run_ocr,
+        args=(pdf_bytes, output_img_dir, os.path.relpath(output_img_dir, output_md_dir), pages_per_chunk, chunks, stop, ocr_cache),
+        name="ocr-pages", daemon=True,
+    )
+
+    md = get_md_parser()
+    start_time = time.perf_counter()
+    translate_seconds = 0.0
+    wait_seconds = 0.0
+    ocr_thread.start()
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as md_file:
+            while True:
+                wait_start = time.perf_counter()
+                item = chunks.get()
+                wait_seconds += time.perf_counter() - wait_start
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                start, end, page_count, markdown = item
+                md_file.write(markdown + "\n\n")
+                md_file.flush()
+
+                translate_start = time.perf_counter()
+                env = {}
+                tokens = md.parse(markdown, env)
+                replace_text_tokens(tokens, model, tokenizer, **translate_kwargs)
+                html = md.renderer.render(tokens, md.options, env)
+                translate_seconds += time.perf_counter() - translate_start
+                if on_progress is not None:
+                    on_progress(end + 1, page_count)
+                yield start, end, html
+        os.replace(tmp_path, md_path)
+    finally:
+        stop.set()
+        ocr_thread.join()
+    total_seconds = time.perf_counter() - start_time
+    # 번역이 OCR을 기다린 시간을 빼면 번역이 쉬지 않고 돈 시간
+    print(
+        f"OCR/번역 스트리밍: 전체 {total_seconds:.1f}s, 번역 {translate_seconds:.1f}s, "
+        f"OCR 대기 {wait_seconds:.1f}s ({pages_per_chunk}페이지 묶음)"
+    )
@@ -0,0 +1,139 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from batch_budget import BatchBudget
+
+KEY = "stub|cpu|quality"
+
+
+class OOMModel:
+    """패딩 포함 입력 토큰이 limit를 넘으면 OOM을 내는 가짜 모델"""
+
+    def __init__(self, limit):
+        from stub_translator import StubModel
+
+        self.model = StubModel(seconds_per_token=0)
+        self.name_or_path = self.model.name_or_path
+        self.limit = limit
+        self.ooms = 0
+
+    def generate(self, input_ids=None, **kwargs):
+        if input_ids.numel() > self.limit:
+            self.ooms += 1
+            raise RuntimeError("CUDA out of memory (stub)")
+        return self.model.generate(input_ids=input_ids, **kwargs)
+
+
+def test_record_oom_ignores_batches_larger_than_budget(tmp_path):
+    budget = BatchBudget(str(tmp_path / "budget.json"))
+    assert budget.get(KEY, 1000) == 1000
+    assert budget.record_oom(KEY, 1000) == 500
+    # 예산을 줄이기 전에 묶인 배치의 OOM
+    assert budget.record_oom(KEY, 900) == 500
+
+
+def test_record_oom_shrinks_below_largest_success(tmp_path):
+    # 공유 장치에서 남은 메모리가 줄면 예전에 성공한 크기도 OOM이 남
+    budget = BatchBudget(str(tmp_path / "budget.json"))
+    budget.get(KEY, 1440)
+    budget.record_success(KEY, 1440)
+    assert budget.record_oom(KEY, 1440) == 720
+    assert budget.record_oom(KEY, 700) == 350
+
+
+def test_largest_success_is_saved(tmp_path):
+    path = str(tmp_path / "budget.json")
+    budget = BatchBudget(path)
+    budget.get(KEY, 1000)
+    budget.record_success(KEY, 300)
+    assert BatchBudget(path).stats()[KEY]["largest_success"] == 300
+
+
+def test_second_document_adapts_when_memory_shrinks(tmp_path):
+    pytest.importorskip("torch")
+    from md_translate import translate_units
+    from stub_translator import StubTokenizer
+
+    budget = BatchBudget(str(tmp_path / "budget.json"))
+    texts = [" ".join(["word"] * (5 + i % 40)) + f" {i}" for i in range(300)]
+    model, tokenizer = OOMModel(limit=1500), StubTokenizer()
+    translate_units(texts, model, tokenizer, device="cpu", max_batch_tokens=1440, budget=budget)
+    assert model.ooms == 0
+    # 다음 문서에서는 다른 작업이 메모리를 차지해 한도가 줄어듦
+    model.limit, model.ooms = 600, 0
+    texts = [text + " again" for text in texts]
+    assert translate_units(texts, model, tokenizer, device="cpu", max_batch_tokens=1440, budget=budget) == texts
+    assert model.ooms <= 2
+
+
+@pytest.mark.parametrize("pipelined", [True, False])
+def test_translate_units_repacks_after_oom(tmp_path, pipelined):
+    pytest.importorskip("torch")
+    from md_translate import translate_units
+    from stub_translator import StubTokenizer
+
+    texts = [" ".join(["word"] * (5 + i % 40)) + f" {i}" for i in range(300)]
+    model, tokenizer = OOMModel(limit=600), StubTokenizer()
+    budget = BatchBudget(str(tmp_path / "budget.json"))
+    translated = translate_units(texts, model, tokenizer, device="cpu", max_batch_tokens=4096, pipelined=pipelined, budget=budget)
+    assert translated == texts
+    # 첫 OOM 뒤 남은 배치는 줄어든 예산으로 다시 묶이므로 OOM이 반복되지 않음
+    assert model.ooms == 1
+
+
+def test_oom_fallback_does_not_share_tokenizer(tmp_path):
+    pytest.importorskip("torch")
+    from md_translate import translate_units
+    from stub_translator import StubTokenizer
+
+    class CheckedTokenizer(StubTokenizer):
+        """두 스레드가 동시에 쓰면 overlaps를 셈"""
+
+        def __init__(self):
+            super().__init__()
+            self.in_use = threading.Lock()
+            self.overlaps = 0
+
+        def _checked(self, fn, *args, **kwargs):
+            if not self.in_use.acquire(blocking=False):
+                self.overlaps += 1
+                return fn(*args, **kwargs)
+            try:
+                time.sleep(0.001)
+                return fn(*args, **kwargs)
+            finally:
+                self.in_use.release()
+
+        def __call__(self, *args, **kwargs):
+            return self._checked(super().__call__, *args, **kwargs)
+
+        def batch_decode(self, *args, **kwargs):
+            return self._checked(super().batch_decode, *args, **kwargs)
+
+    texts = [" ".join(["word"] * (5 + i % 40)) + f" {i}" for i in range(300)]
+    model, tokenizer = OOMModel(limit=600), CheckedTokenizer()
+    # 예산을 학습하지 않으면 OOM 배치가 여러 번 나와 파이프라인 중간에 나눠 번역함
+    translate_units(texts, model, tokenizer, device="cpu", max_batch_tokens=4096, pipelined=True)
+    assert model.ooms > 1
+    assert tokenizer.overlaps == 0
+
+
+def test_model_keys_include_quantized_backend():
+    pytest.importorskip("torch")
+    from md_translate import get_budget_key, get_decoding_policy, get_model_name, set_model_backend
+    from stub_translator import StubModel
+
+    fp32_model, int8_model = StubModel(0), StubModel(0)
+    set_model_backend(fp32_model, "torch")
+    set_model_backend(int8_model, "int8")
+    # 양자화 모델도 같은 name_or_path를 가짐
+    assert get_model_name(fp32_model) == "stub-translator"
+    assert get_model_name(int8_model) == "stub-translator@int8"
+    policy = get_decoding_policy("fast")
+    assert get_budget_key(fp32_model, "cpu", policy) != get_budget_key(int8_model, "cpu", policy)
@@ -0,0 +1,44 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from ocr_worker import OCRWorkerPool
+
+
+def _square(x):
+    return x * x
+
+
+# analyze_pdf(num_workers > 1)처럼 작업 프로세스 안에서 프로세스 풀을 띄우는 작업
+def _nested_pool_task(n):
+    with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return sum(executor.map(_square, range(n)))
+
+
+def _make_pdf(path, pages=4):
+    import fitz
+
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f"Page {i} of a digital paper with enough text for the text layer. " * 3)
+    doc.save(path)
+
+
+def test_worker_can_start_child_processes():
+    with OCRWorkerPool(num_workers=1, preload=False) as pool:
+        assert pool.submit(_nested_pool_task, 4).result(timeout=120) == 14
+
+
+def test_sharded_ocr_job_through_pool(tmp_path):
+    pytest.importorskip("magic_pdf")
+    from batch_translate import get_document_paths, run_ocr
+
+    pdf_path = str(tmp_path / "paper.pdf")
+    _make_pdf(pdf_path)
+    paths = get_document_paths(pdf_path, str(tmp_path / "outputs"))
+    with OCRWorkerPool(num_workers=1, preload=False) as pool:
+        # batch_translate --ocr-shard-workers 2와 같은 호출
+        pool.submit(run_ocr, pdf_path, paths, 2).result(timeout=600)
+    with open(paths["md_path"], "r", encoding="utf-8") as f:
+        assert f.read()
@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+try:
+    import transform_html
+except (ImportError, OSError) as e:
+    # WeasyPrint는 pango 등 시스템 라이브러리가 없으면 OSError
+    pytest.skip(f"WeasyPrint를 사용할 수 없음: {e}", allow_module_level=True)
+
+from batch_translate import get_document_paths, run_pdf
+
+
+def _make_document(tmp_path):
+    """outputs/<문서>/ 구조와 마크다운 기준 상대 경로(../images/...)로 이미지를 참조하는 HTML"""
+    import fitz
+
+    paths = get_document_paths(str(tmp_path / "paper.pdf"), str(tmp_path / "outputs"))
+    os.makedirs(paths["image_dir"])
+    os.makedirs(paths["md_dir"])
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 64, 64))
+    pix.clear_with(120)
+    pix.save(os.path.join(paths["image_dir"], "figure.png"))
+    image_ref = os.path.relpath(os.path.join(paths["image_dir"], "figure.png"), paths["md_dir"])
+    with open(paths["html_path"], "w", encoding="utf-8") as f:
+        f.write(f'<p>그림 1</p><p><img src="{image_ref}" alt=""></p>')
+    return paths
+
+
+def _pdf_image_count(pdf_path):
+    import fitz
+
+    with fitz.open(pdf_path) as doc:
+        return sum(len(page.get_images()) for page in doc)
+
+
+def test_relative_image_paths_resolve_from_markdown_dir(tmp_path):
+    paths = _make_document(tmp_path)
+    with open(paths["html_path"], "r", encoding="utf-8") as f:
+        html_content = f.read()
+    pdf_path = str(tmp_path / "out.pdf")
+    transform_html.html_to_pdf_with_weasyprint(html_content, pdf_path, base_dir=paths["md_dir"], render_math=False)
+    assert _pdf_image_count(pdf_path) == 1
+
+
+def test_batch_pdf_export_keeps_images(tmp_path):
+    paths = _make_document(tmp_path)
+    run_pdf(paths)
+    assert _pdf_image_count(paths["pdf_path"]) == 1
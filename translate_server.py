@@ -0,0 +1,348 @@
+# translate_server.py
+# 모델을 한 번만 올려 두고 여러 클라이언트(Streamlit 세션, 배치 작업)의 번역 요청을
+# 하나의 배치 큐로 모아 처리하는 로컬 번역 서버
+#
+# 실행 예:
+#   python translate_server.py --port 8765                      # http://127.0.0.1:8765
+#   python translate_server.py --unix-socket /tmp/translator.sock
+# 클라이언트:
+#   md_translate_to_html(md_path, None, None, server_url="http://127.0.0.1:8765")
+#   md_translate_to_html(md_path, None, None, server_url="unix:///tmp/translator.sock")
+
+import os
+import json
+import time
+import queue
+import socket
+import argparse
+import threading
+import http.client
+import socketserver
+from dataclasses import asdict
+from urllib.parse import urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from decoding_policy import DecodingPolicy
+from md_translate import (
+    get_decoding_policy,
+    get_model_name,
+    get_budget_key,
+    get_token_lengths,
+    build_length_batches,
+    segment_texts,
+    stitch_segments,
+    translate_batch,
+)
+
+
+class TranslationRequest:
+    """한 클라이언트 요청에서 모델 번역이 필요한 단위들과 결과"""
+
+    def __init__(self, units, policy):
+        self.units = units
+        self.policy = policy
+        self.results = [None] * len(units)
+        self.remaining = len(units)
+        self.error = None
+        self.done = threading.Event()
+        if not units:
+            self.done.set()
+
+
+class ContinuousBatcher:
+    """
+    여러 요청의 번역 단위를 계속 모아 정책별로 길이 버킷 배치를 만들어 번역
+    배치 하나가 끝날 때마다 그 사이 새로 들어온 단위까지 다시 모아 다음 배치를 구성
+    """
+
+    def __init__(self, model, tokenizer, device="cuda", batch_size=32, max_batch_tokens=4096, max_length=512, max_wait=0.01, memory=None, budget=None):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = device
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_length = max_length
+        self.max_wait = max_wait
+        self.memory = memory
+        self.budget = budget
+        self.model_name = get_model_name(model)
+        self.stats = {"requests": 0, "units": 0, "batches": 0, "batched_units": 0, "memory_hits": 0}
+        self._incoming = queue.Queue()
+        # 정책 키 → {원문: [도착 시각, 토큰 길이, [(요청, 위치), ...]]}
+        self._pending = {}
+        self._policies = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="translation-batcher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._incoming.put(None)
+        self._thread.join()
+
+    def submit(self, units, policy=None):
+        """번역 단위 리스트를 큐에 넣고 끝날 때까지 기다린 뒤 결과 반환"""
+        policy = get_decoding_policy(policy, max_length=self.max_length)
+        settings = policy.cache_settings()
+        cached = {}
+        if self.memory is not None:
+            cached = self.memory.lookup(list(dict.fromkeys(units)), self.model_name, settings)
+        request = TranslationRequest(units, policy)
+        self.stats["requests"] += 1
+        self.stats["units"] += len(units)
+        self.stats["memory_hits"] += sum(1 for u in units if u in cached)
+
+        misses = []
+        for i, unit in enumerate(units):
+            if unit in cached:
+                request.results[i] = cached[unit]
+                request.remaining -= 1
+            else:
+                misses.append(i)
+        if request.remaining == 0:
+            request.done.set()
+        else:
+            self._incoming.put((request, misses))
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.results
+
+    def queue_size(self):
+        with self._lock:
+            return sum(len(items) for items in self._pending.values()) + self._incoming.qsize()
+
+    def _drain(self, block):
+        try:
+            item = self._incoming.get(timeout=0.5) if block else self._incoming.get_nowait()
+        except queue.Empty:
+            return False
+        while item is not None:
+            with self._lock:
+                self._add(*item)
+            try:
+                item = self._incoming.get_nowait()
+            except queue.Empty:
+                break
+        return True
+
+    def _add(self, request, indices):
+        key = json.dumps(request.policy.cache_settings(), sort_keys=True)
+        self._policies[key] = request.policy
+        pending = self._pending.setdefault(key, {})
+        now = time.monotonic()
+        new_texts = [request.units[i] for i in indices if request.units[i] not in pending]
+        lengths = dict(zip(new_texts, get_token_lengths(new_texts, self.tokenizer, max_length=self.max_length)))
+        for i in indices:
+            text = request.units[i]
+            # 다른 요청과 같은 문장은 한 번만 번역
+            if text not in pending:
+                pending[text] = [now, lengths[text], []]
+            pending[text][2].append((request, i))
+
+    def _next_batch(self):
+        """가장 오래 기다린 항목이 포함된 배치를 골라 반환"""
+        key = min(
+            (k for k, items in self._pending.items() if items),
+            key=lambda k: min(item[0] for item in self._pending[k].values()),
+        )
+        pending = self._pending[key]
+        texts = list(pending)
+        lengths = [pending[t][1] for t in texts]
+        oldest = min(range(len(texts)), key=lambda i: pending[texts[i]][0])
+        policy = self._policies[key]
+        max_batch_tokens = self.max_batch_tokens
+        if self.budget is not None:
+            max_batch_tokens = self.budget.get(get_budget_key(self.model, self.device, policy), max_batch_tokens)
+        batches = build_length_batches(lengths, max_batch_tokens=max_batch_tokens, max_batch_size=self.batch_size)
+        batch = next(b for b in batches if oldest in b)
+        batch_texts = [texts[i] for i in batch]
+        waiters = [pending.pop(t)[2] for t in batch_texts]
+        return policy, batch_texts, waiters
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not any(self._pending.values()):
+                if not self._drain(block=True):
+                    continue
+                # 동시에 들어오는 요청이 한 배치로 합쳐지도록 잠시 대기
+                time.sleep(self.max_wait)
+            self._drain(block=False)
+            if not any(self._pending.values()):
+                continue
+
+            with self._lock:
+                policy, batch_texts, waiters = self._next_batch()
+            try:
+                translated = translate_batch(batch_texts, self.model, self.tokenizer, device=self.device, max_length=self.max_length, policy=policy, budget=self.budget)
+            except Exception as e:
+                for group in waiters:
+                    for request, _ in group:
+                        request.error = e
+                        request.done.set()
+                continue
+            if self.memory is not None:
+                self.memory.store(list(zip(batch_texts, translated)), self.model_name, policy.cache_settings())
+            self.stats["batches"] += 1
+            self.stats["batched_units"] += len(batch_texts)
+            for new_text, group in zip(translated, waiters):
+                for request, i in group:
+                    request.results[i] = new_text
+                    request.remaining -= 1
+                    if request.remaining == 0:
+                        request.done.set()
+
+
+class TranslationHandler(BaseHTTPRequestHandler):
+    """POST /translate {"texts": [...], "policy": ...} → {"translations": [...]}, GET /health"""
+
+    server_version = "PaperTranslator/1.0"
+
+    def do_GET(self):
+        if self.path != "/health":
+            self.send_error(404)
+            return
+        batcher = self.server.batcher
+        self._send_json(200, {"status": "ok", "model": batcher.model_name, "queue": batcher.queue_size(), **batcher.stats})
+
+    def do_POST(self):
+        if self.path != "/translate":
+            self.send_error(404)
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            texts = body["texts"]
+            policy = body.get("policy")
+            if isinstance(policy, dict):
+                policy = DecodingPolicy(**policy)
+            max_segment_tokens = body.get("max_segment_tokens", 160)
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"error": f"잘못된 요청입니다: {e}"})
+            return
+        batcher = self.server.batcher
+        try:
+            units, plans = segment_texts(texts, batcher.tokenizer, max_segment_tokens=max_segment_tokens, max_length=batcher.max_length)
+            translated = stitch_segments(batcher.submit(units, policy=policy), plans) if texts else []
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+        self._send_json(200, {"translations": translated})
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self):
+        # Unix 소켓은 client_address가 비어 있음
+        return self.client_address[0] if self.client_address else "unix"
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ("unix", 0)
+
+
+# 번역 서버 생성 함수 (serve_forever()로 실행)
+def create_server(batcher, host="127.0.0.1", port=8765, unix_socket=None):
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.unlink(unix_socket)
+        server = ThreadingUnixHTTPServer(unix_socket, TranslationHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), TranslationHandler)
+    server.batcher = batcher
+    return server
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """Unix 소켓으로 접속하는 HTTPConnection"""
+
+    def __init__(self, socket_path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def _open_connection(server_url, timeout):
+    parsed = urlparse(server_url)
+    if parsed.scheme == "unix":
+        return UnixHTTPConnection(parsed.path, timeout=timeout)
+    if parsed.scheme == "https":
+        return http.client.HTTPSConnection(parsed.hostname, parsed.port, timeout=timeout)
+    return http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=timeout)
+
+
+# 번역 서버 클라이언트 함수 (texts 순서대로 번역 결과 반환)
+def request_translation(texts, server_url, policy=None, max_segment_tokens=160, timeout=3600):
+    if not texts:
+        return []
+    if isinstance(policy, DecodingPolicy):
+        policy = asdict(policy)
+    body = json.dumps({"texts": texts, "policy": policy, "max_segment_tokens": max_segment_tokens}, ensure_ascii=False).encode("utf-8")
+    conn = _open_connection(server_url, timeout)
+    try:
+        conn.request("POST", "/translate", body=body, headers={"Content-Type": "application/json; charset=utf-8"})
+        response = conn.getresponse()
+        payload = json.loads(response.read())
+    finally:
+        conn.close()
+    if response.status != 200:
+        raise RuntimeError(f"번역 서버 오류 ({response.status}): {payload.get('error')}")
+    return payload["translations"]
+
+
+def main():
+    from md_translate import load_mbart_model
+    from translation_memory import TranslationMemory
+    from batch_budget import BatchBudget
+
+    parser = argparse.ArgumentParser(description="로컬 번역 서버 (연속 배치 처리)")
+    parser.add_argument("--model", default="aeolian83/mbart-en-ko-ptt-latex")
+    parser.add_argument("--device", default="cuda")
+    parser.add_argument("--backend", default="torch", choices=["torch", "int8", "onnx"])
+    parser.add_argument("--draft-model", default=None, help="assisted decoding용 초안 모델 (선택)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix-socket", default=None)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-batch-tokens", type=int, default=4096)
+    parser.add_argument("--memory", default=None, help="번역 메모리 SQLite 경로 (선택)")
+    parser.add_argument("--batch-budget", default=None, help="학습한 배치 예산을 저장할 JSON 경로 (선택)")
+    args = parser.parse_args()
+
+    model, tokenizer = load_mbart_model(args.model, device=args.device, backend=args.backend, draft_model_name=args.draft_model)
+    memory = TranslationMemory(args.memory) if args.memory else None
+    budget = BatchBudget(args.batch_budget) if args.batch_budget else None
+    batcher = ContinuousBatcher(
+        model, tokenizer, device=args.device, batch_size=args.batch_size,
+        max_batch_tokens=args.max_batch_tokens, memory=memory, budget=budget,
+    )
+    batcher.start()
+    server = create_server(batcher, host=args.host, port=args.port, unix_socket=args.unix_socket)
+    print(f"번역 서버 시작: {args.unix_socket or f'http://{args.host}:{args.port}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.stop()
+
+
+if __name__ == "__main__":
+    main()
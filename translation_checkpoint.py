@@ -0,0 +1,64 @@
+# translation_checkpoint.py
+
+import os
+import json
+import hashlib
+
+
+class TranslationCheckpoint:
+    """
+    문서 번역 진행 상황을 마크다운 파일 옆(<이름>.progress.jsonl)에 배치마다 기록
+    첫 줄은 원문 해시와 번역 설정, 이후 줄은 {"i": 문단(번역 단위) 인덱스, "t": 번역 결과}
+    원문이나 설정이 바뀌면 이전 기록은 무시하고 처음부터 다시 기록
+    """
+
+    def __init__(self, md_path, md_text, settings):
+        self.path = os.path.splitext(md_path)[0] + ".progress.jsonl"
+        self.header = {
+            "source_sha256": hashlib.sha256(md_text.encode("utf-8")).hexdigest(),
+            "settings": settings,
+        }
+        self.translated = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        try:
+            header = json.loads(lines[0]) if lines else None
+        except json.JSONDecodeError:
+            header = None
+        if header != json.loads(json.dumps(self.header)):
+            print(f"번역 체크포인트가 현재 문서/설정과 달라 무시합니다: {self.path}")
+            os.remove(self.path)
+            return
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # 중단 시점에 쓰다 만 마지막 줄
+                continue
+            self.translated[entry["i"]] = entry["t"]
+        print(f"번역 체크포인트에서 {len(self.translated)}개 항목을 이어서 사용합니다: {self.path}")
+
+    def record(self, results):
+        """{문단 인덱스: 번역 결과}를 파일 끝에 추가"""
+        results = {i: t for i, t in results.items() if i not in self.translated}
+        if not results:
+            return
+        new_file = not os.path.exists(self.path)
+        with open(self.path, "a", encoding="utf-8") as f:
+            if new_file:
+                f.write(json.dumps(self.header, ensure_ascii=False) + "\n")
+            for i, text in results.items():
+                f.write(json.dumps({"i": i, "t": text}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.translated.update(results)
+
+    def clear(self):
+        """문서 번역이 모두 끝나면 체크포인트 파일 삭제"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,107 @@
+# translation_memory.py
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+
+class TranslationMemory:
+    """
+    SQLite 기반 번역 메모리 캐시
+    (원문, 모델 이름, 디코딩 설정)의 해시를 키로 번역 결과를 저장하고,
+    max_entries를 넘으면 가장 오래 사용되지 않은 항목부터 삭제
+    """
+
+    def __init__(self, db_path, max_entries=200000):
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Streamlit 재실행 시 다른 스레드에서 접근할 수 있으므로 check_same_thread=False
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS memory ("
+            " key TEXT PRIMARY KEY,"
+            " translation TEXT NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_memory_last_used ON memory(last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(text, model_name, settings):
+        """원문, 모델 이름, 디코딩 설정(dict)으로 캐시 키 생성"""
+        payload = json.dumps([model_name, settings, text], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def lookup(self, texts, model_name, settings):
+        """texts 각각에 대해 저장된 번역을 찾아 {원문: 번역} 형태로 반환"""
+        keys = {self.make_key(t, model_name, settings): t for t in texts}
+        found = {}
+        with self._lock:
+            key_list = list(keys)
+            # SQLite 변수 개수 제한을 피하기 위해 나눠서 조회
+            for i in range(0, len(key_list), 500):
+                chunk = key_list[i:i+500]
+                rows = self._conn.execute(
+                    f"SELECT key, translation FROM memory WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for key, translation in rows:
+                    found[keys[key]] = translation
+            now = time.time()
+            self._conn.executemany(
+                "UPDATE memory SET last_used = ? WHERE key = ?",
+                [(now, self.make_key(t, model_name, settings)) for t in found],
+            )
+            self._conn.commit()
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def store(self, pairs, model_name, settings):
+        """(원문, 번역) 쌍들을 저장하고 용량 초과분을 정리"""
+        if not pairs:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO memory (key, translation, last_used) VALUES (?, ?, ?)",
+                [(self.make_key(src, model_name, settings), tgt, now) for src, tgt in pairs],
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM memory").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM memory WHERE key IN (SELECT key FROM memory ORDER BY last_used ASC LIMIT ?)",
+                (overflow,),
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM memory").fetchone()[0]
+
+    def stats(self):
+        """히트/미스 카운터와 저장된 항목 수 반환"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self),
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
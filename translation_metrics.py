@@ -0,0 +1,69 @@
+# translation_metrics.py
+
+import sys
+import json
+import time
+
+
+class TranslationMetrics:
+    """
+    translate_batch 배치별 성능 지표 수집기
+    배치마다 토크나이즈/generate/디코드 시간, 원문/번역 토큰 수, 패딩 비율, 배치 크기, 최대 메모리를 기록
+    """
+
+    def __init__(self, device="cuda"):
+        self.device = device
+        self.batches = []
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.wall_seconds = None
+        if str(device).startswith("cuda"):
+            import torch
+            torch.cuda.reset_peak_memory_stats()
+
+    def record_batch(self, **values):
+        values["tokens_per_second"] = values["target_tokens"] / values["generate_seconds"] if values["generate_seconds"] else 0.0
+        self.batches.append(values)
+
+    def peak_memory_bytes(self):
+        """GPU는 torch 최대 할당량, CPU는 프로세스 최대 RSS"""
+        if str(self.device).startswith("cuda"):
+            import torch
+            return torch.cuda.max_memory_allocated()
+        try:
+            import resource
+        except ImportError:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS는 바이트, Linux는 KB 단위
+        return peak if sys.platform == "darwin" else peak * 1024
+
+    def finish(self):
+        self.wall_seconds = time.perf_counter() - self._start
+
+    def summary(self):
+        def total(key):
+            return sum(b[key] for b in self.batches)
+        generate_seconds = total("generate_seconds")
+        padded = total("padded_tokens")
+        return {
+            "device": str(self.device),
+            "wall_seconds": self.wall_seconds if self.wall_seconds is not None else time.perf_counter() - self._start,
+            "batches": len(self.batches),
+            "items": total("batch_size"),
+            "source_tokens": total("source_tokens"),
+            "target_tokens": total("target_tokens"),
+            "tokenize_seconds": total("tokenize_seconds"),
+            "generate_seconds": generate_seconds,
+            "decode_seconds": total("decode_seconds"),
+            "padding_ratio": 1.0 - total("source_tokens") / padded if padded else 0.0,
+            "tokens_per_second": total("target_tokens") / generate_seconds if generate_seconds else 0.0,
+            "peak_memory_bytes": self.peak_memory_bytes(),
+        }
+
+    def to_dict(self):
+        return {"started_at": self.started_at, "summary": self.summary(), "batches": self.batches}
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)